@@ -0,0 +1,27 @@
+"""Add event version
+
+Revision ID: 6f1c2b7e9a41
+Revises: d433c52682d4
+Create Date: 2022-02-20 10:12:31.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "6f1c2b7e9a41"
+down_revision = "d433c52682d4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "events",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("events", "version")
@@ -2,6 +2,7 @@
 from fastapi import APIRouter
 
 from app.api.api_v1.endpoints import (
+    admin,
     cost_aggregator,
     countries,
     event_cost_aggregator,
@@ -46,5 +47,10 @@ api_router.include_router(
     prefix="/participants",
     tags=["participants"],
 )
+api_router.include_router(
+    admin.router,
+    prefix="/admin",
+    tags=["admin"],
+)
 
 calculators.register(api_router)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import Callable, Optional, Union
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import async_engine
+
+logger = logging.getLogger("uvicorn.error")
+
+EventId = int
+EventUpdateHandler = Callable[[EventId], None]
+
+
+class InProcessBroadcast:
+    def __init__(self: "InProcessBroadcast") -> None:
+        """Event update broadcast within a single worker process"""
+        self._handlers: list[EventUpdateHandler] = []
+
+    def subscribe(self: "InProcessBroadcast", handler: EventUpdateHandler) -> None:
+        self._handlers.append(handler)
+
+    async def connect(self: "InProcessBroadcast") -> None:
+        pass
+
+    async def disconnect(self: "InProcessBroadcast") -> None:
+        pass
+
+    async def publish(self: "InProcessBroadcast", event_id: EventId) -> None:
+        """Notify subscribers that an event's participants or costs changed"""
+        self._notify(event_id)
+
+    def _notify(self: "InProcessBroadcast", event_id: EventId) -> None:
+        for handler in self._handlers:
+            handler(event_id)
+
+
+class PostgresBroadcast(InProcessBroadcast):
+    def __init__(
+        self: "PostgresBroadcast",
+        dsn: str,
+        channel: str = "event_updates",
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        """Event update broadcast to all workers through Postgres LISTEN/NOTIFY
+
+        Each worker listens on `channel` with a dedicated connection read by the
+        event loop. Notifications only carry the ID of the updated event, every
+        worker then loads the event itself, so payloads stay within the
+        NOTIFY size limit. A worker also receives its own notifications.
+
+        Args:
+            dsn: libpq connection string or URI of the database
+            channel: Name of notification channel
+            reconnect_delay: Seconds between attempts to reconnect the listener
+        """
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._connection: Optional[psycopg2.extensions.connection] = None
+        self._fileno: Optional[int] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def connect(self: "PostgresBroadcast") -> None:
+        self._closing = False
+        connection = await run_in_threadpool(psycopg2.connect, self.dsn)
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+
+        self._connection = connection
+        self._fileno = connection.fileno()
+        asyncio.get_running_loop().add_reader(self._fileno, self._read_notifications)
+
+    async def disconnect(self: "PostgresBroadcast") -> None:
+        self._closing = True
+
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+
+        self._close_connection()
+
+    async def publish(self: "PostgresBroadcast", event_id: EventId) -> None:
+        """Notify all workers, this one included, that an event changed"""
+        async with async_engine.begin() as connection:
+            await connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": str(event_id)},
+            )
+
+    def _read_notifications(self: "PostgresBroadcast") -> None:
+        connection = self._connection
+
+        if connection is None:
+            return
+
+        try:
+            connection.poll()
+        except psycopg2.Error as error:
+            logger.warning("Broadcast listener connection lost: %r", error)
+            self._close_connection()
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+            return
+
+        while connection.notifies:
+            notification = connection.notifies.pop(0)
+
+            try:
+                event_id = EventId(notification.payload)
+            except ValueError:
+                logger.warning("Invalid broadcast payload: %r", notification.payload)
+                continue
+
+            self._notify(event_id)
+
+    async def _reconnect(self: "PostgresBroadcast") -> None:
+        while not self._closing:
+            await asyncio.sleep(self.reconnect_delay)
+
+            try:
+                await self.connect()
+                logger.info("Broadcast listener reconnected")
+                return
+            except psycopg2.Error as error:
+                logger.warning("Broadcast listener reconnection failed: %r", error)
+
+    def _close_connection(self: "PostgresBroadcast") -> None:
+        connection, self._connection = self._connection, None
+
+        if connection is None:
+            return
+
+        # The socket may already be gone, stop watching it before closing
+        asyncio.get_running_loop().remove_reader(self._fileno)
+        self._fileno = None
+
+        if not connection.closed:
+            connection.close()
+
+
+Broadcast = Union[InProcessBroadcast, PostgresBroadcast]
+
+
+def build_broadcast() -> Broadcast:
+    """Build the broadcast backend configured in settings"""
+    if settings.BROADCAST_BACKEND == "postgres":
+        # libpq does not understand SQLAlchemy driver suffixes such as "+psycopg2"
+        dsn = str(settings.SQLALCHEMY_DATABASE_URI).replace("+psycopg2", "")
+        return PostgresBroadcast(dsn, channel=settings.BROADCAST_CHANNEL)
+
+    return InProcessBroadcast()
+
+
+broadcast = build_broadcast()
@@ -0,0 +1,181 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+from typing import Any, Callable, Literal, Optional, TYPE_CHECKING
+
+from app.api.api_v1.result_cache import CalculatorResultCache, result_cache
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.api.api_v1.calculator_interface import CalculatorInterface  # noqa
+
+PoolType = Literal["thread", "process"]
+
+
+def spawn_process_pool(
+    max_workers: Optional[int] = None,
+) -> concurrent.futures.ProcessPoolExecutor:
+    """Process pool whose workers start from a fresh interpreter
+
+    Forking the multi-threaded server would copy its threads' locks, database
+    connections and event loop state into the workers, spawned workers only
+    import what the functions they run need.
+    """
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+class CalculatorExecutor:
+    def __init__(
+        self: "CalculatorExecutor",
+        pool_type: PoolType = "thread",
+        max_workers: Optional[int] = None,
+        concurrency: int = 64,
+        result_cache: Optional[CalculatorResultCache] = None,
+    ) -> None:
+        """Run calculator entrypoints regardless of whether they are sync or async
+
+        Coroutine entrypoints are awaited on the event loop, sync entrypoints are
+        called directly unless the calculator is marked `cpu_bound`, in which case
+        they run in a thread or process pool. At most `concurrency` calculations
+        are in flight at once across all callers. Responses are served from and
+        stored in the result cache if one is given.
+
+        Args:
+            pool_type: Kind of pool CPU-bound entrypoints run in
+            max_workers: Size of pool, defaults to the executor's default for the
+                number of available cores
+            concurrency: Maximum number of concurrently running calculations
+            result_cache: Cache of calculator responses
+        """
+        self.pool_type = pool_type
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self.result_cache = result_cache
+        self._pool: Optional[concurrent.futures.Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def pool(self: "CalculatorExecutor") -> concurrent.futures.Executor:
+        if self._pool is None:
+            if self.pool_type == "process":
+                self._pool = spawn_process_pool(self.max_workers)
+            else:
+                self._pool = concurrent.futures.ThreadPoolExecutor(self.max_workers)
+
+        return self._pool
+
+    @property
+    def semaphore(self: "CalculatorExecutor") -> asyncio.Semaphore:
+        # Created lazily so it is bound to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        return self._semaphore
+
+    async def run(
+        self: "CalculatorExecutor",
+        calculator: "CalculatorInterface",
+        request: Any,
+    ) -> Any:
+        """Run a calculator's entrypoint on a validated request"""
+        if self.result_cache is None:
+            return await self._call(
+                calculator.entrypoint, calculator.cpu_bound, request
+            )
+
+        key = self.result_cache.key(calculator, request)
+        (response,) = await self.result_cache.get_many(calculator, [key])
+
+        if response is None:
+            response = await self._call(
+                calculator.entrypoint, calculator.cpu_bound, request
+            )
+            await self.result_cache.set_many({key: response})
+
+        return response
+
+    async def run_batch(
+        self: "CalculatorExecutor",
+        calculator: "CalculatorInterface",
+        requests: list[Any],
+    ) -> list[Any]:
+        """Run a calculator on many validated requests
+
+        Calculators implementing `batch_entrypoint` are called once for the whole
+        batch, others have their entrypoint run concurrently for each request.
+        Only distinct requests missing from the result cache are calculated.
+
+        Returns: Responses in the same order as requests
+        """
+        if self.result_cache is None:
+            return await self._run_batch(calculator, requests)
+
+        keys = [self.result_cache.key(calculator, request) for request in requests]
+        responses = await self.result_cache.get_many(calculator, keys)
+
+        # Identical requests within the batch are only calculated once
+        missing = {
+            key: request
+            for key, request, response in zip(keys, requests, responses)
+            if response is None
+        }
+
+        if len(missing) != 0:
+            computed = await self._run_batch(calculator, list(missing.values()))
+            computed_by_key = dict(zip(missing.keys(), computed))
+
+            await self.result_cache.set_many(computed_by_key)
+
+            responses = [
+                computed_by_key[key] if response is None else response
+                for key, response in zip(keys, responses)
+            ]
+
+        return responses
+
+    async def _run_batch(
+        self: "CalculatorExecutor",
+        calculator: "CalculatorInterface",
+        requests: list[Any],
+    ) -> list[Any]:
+        if calculator.batch_entrypoint is None:
+            entrypoint, cpu_bound = calculator.entrypoint, calculator.cpu_bound
+            responses = await asyncio.gather(
+                *(self._call(entrypoint, cpu_bound, request) for request in requests)
+            )
+            return list(responses)
+
+        entrypoint = calculator.batch_entrypoint
+        return await self._call(entrypoint, calculator.cpu_bound, requests)
+
+    async def _call(
+        self: "CalculatorExecutor",
+        entrypoint: Callable[[Any], Any],
+        cpu_bound: bool,
+        argument: Any,
+    ) -> Any:
+        async with self.semaphore:
+            if asyncio.iscoroutinefunction(entrypoint):
+                return await entrypoint(argument)
+
+            if cpu_bound:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.pool, entrypoint, argument)
+
+            return entrypoint(argument)
+
+    def shutdown(self: "CalculatorExecutor") -> None:
+        if self._pool is not None:
+            # Waits for running calculations only, so workers exit cleanly
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+calculator_executor = CalculatorExecutor(
+    pool_type=settings.CALCULATOR_POOL,
+    max_workers=settings.CALCULATOR_POOL_WORKERS,
+    concurrency=settings.CALCULATOR_CONCURRENCY,
+    result_cache=result_cache,
+)
@@ -1,9 +1,16 @@
+import functools
 import itertools
-from typing import Any, Type, Generic, TypeVar, Callable, Awaitable, Optional
+from typing import Any, Type, Generic, TypeVar, Callable, Awaitable, Optional, Union
 
 from fastapi import APIRouter, FastAPI
 from pydantic import BaseModel
 from pydantic.generics import GenericModel
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.api.api_v1.calculator_executor import calculator_executor
+from app.core.config import settings
+from app.core.http_cache import CachedDocument
 
 RequestT = TypeVar("RequestT", bound=BaseModel)
 ResponseT = TypeVar("ResponseT", bound=BaseModel)
@@ -12,12 +19,16 @@ ResponseT = TypeVar("ResponseT", bound=BaseModel)
 class CalculatorInterface(GenericModel, Generic[RequestT, ResponseT]):
     name: str
     path: str
-    entrypoint: Callable[[RequestT], Awaitable[ResponseT]]
+    entrypoint: Callable[[RequestT], Union[ResponseT, Awaitable[ResponseT]]]
+    batch_entrypoint: Optional[
+        Callable[[list[RequestT]], Union[list[ResponseT], Awaitable[list[ResponseT]]]]
+    ] = None
     request_model: Type[RequestT]
     response_model: Type[ResponseT]
     method: str = "post"
     router_args: Optional[dict[str, Any]] = None
     get_total_carbon_kg: Callable[[ResponseT], float]
+    cpu_bound: bool = False
 
     @property
     def request_schema(self: "CalculatorInterface") -> dict[str, Any]:
@@ -38,6 +49,7 @@ class CalculatorInterfaces:
     ) -> None:
         self._calculators = calculator_interfaces
         self._calculators_by_name = {m.name: m for m in calculator_interfaces}
+        self._documents: Optional[dict[str, CachedDocument]] = None
 
     @property
     def calculators(self: "CalculatorInterfaces") -> list[CalculatorInterface]:
@@ -63,20 +75,78 @@ class CalculatorInterfaces:
     def response_schemas(self: "CalculatorInterfaces") -> list[dict[str, Any]]:
         return [calculator.response_schema for calculator in self.calculators]
 
+    @property
+    def all_calculators(self: "CalculatorInterfaces") -> list[dict[str, Any]]:
+        return [
+            {
+                "name": calculator.name,
+                "path": calculator.path,
+                "method": calculator.method,
+                "request": calculator.request_schema,
+                "response": calculator.response_schema,
+            }
+            for calculator in self.calculators
+        ]
+
+    @property
+    def documents(self: "CalculatorInterfaces") -> dict[str, CachedDocument]:
+        """Schema documents, encoded once as calculators do not change at runtime"""
+        if self._documents is None:
+            max_age = settings.CALCULATOR_SCHEMAS_MAX_AGE
+            contents = {
+                "calculators": {"calculators": self.interfaces},
+                "requests": {"requests": self.request_schemas},
+                "responses": {"responses": self.response_schemas},
+                "all": {"calculators": self.all_calculators},
+            }
+            self._documents = {
+                name: CachedDocument(content, max_age=max_age)
+                for name, content in contents.items()
+            }
+
+        return self._documents
+
     async def get_calculators(
         self: "CalculatorInterfaces",
-    ) -> dict[str, list[dict[str, Any]]]:
-        return {"calculators": self.interfaces}
+        request: Request,
+    ) -> Response:
+        return self.documents["calculators"].response(request)
 
     async def get_requests(
         self: "CalculatorInterfaces",
-    ) -> dict[str, list[dict[str, Any]]]:
-        return {"requests": self.request_schemas}
+        request: Request,
+    ) -> Response:
+        return self.documents["requests"].response(request)
 
     async def get_responses(
         self: "CalculatorInterfaces",
-    ) -> dict[str, list[dict[str, Any]]]:
-        return {"responses": self.response_schemas}
+        request: Request,
+    ) -> Response:
+        return self.documents["responses"].response(request)
+
+    async def get_all(
+        self: "CalculatorInterfaces",
+        request: Request,
+    ) -> Response:
+        """Names, paths and request and response schemas of all calculators"""
+        return self.documents["all"].response(request)
+
+    @staticmethod
+    def build_endpoint(
+        calculator: CalculatorInterface,
+    ) -> Callable[..., Awaitable[Any]]:
+        """Wrap a calculator's entrypoint to run it through the calculator executor
+
+        The wrapper keeps the entrypoint's signature and docstring, so the route
+        validates and documents the same request model.
+        """
+
+        @functools.wraps(calculator.entrypoint)
+        async def endpoint(**kwargs: Any) -> Any:
+            (request,) = kwargs.values()
+            return await calculator_executor.run(calculator, request)
+
+        return endpoint
 
     def register(self: "CalculatorInterfaces", app: FastAPI) -> None:
         router = APIRouter()
@@ -84,14 +154,17 @@ class CalculatorInterfaces:
         for calculator in self.calculators:
             router.add_api_route(
                 path=calculator.path,
-                endpoint=calculator.entrypoint,
+                endpoint=self.build_endpoint(calculator),
                 name=calculator.name,
                 methods=[calculator.method],
                 response_model=calculator.response_model,
                 **(calculator.router_args or {}),
             )
 
+        # Build the schema documents now rather than on the first request
+        self.documents
         app.add_route("/calculators", self.get_calculators)
+        app.add_route("/calculators/all", self.get_all)
         app.add_route("/calculator-requests", self.get_requests)
         app.add_route("/calculator-responses", self.get_responses)
         app.include_router(router)
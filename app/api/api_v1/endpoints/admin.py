@@ -0,0 +1,74 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+
+from app.api.api_v1.endpoints import event_cost_aggregator, flight_calculator
+from app.api.api_v1.result_cache import CalculatorResultCache, result_cache
+from app.db.pool import pool_stats
+from app.db.session import async_engine, engine
+
+router = APIRouter()
+
+
+@router.get("/flight-distance-cache")
+def read_flight_distance_cache() -> dict[str, Any]:
+    """Get flight stage distance cache statistics"""
+    return flight_calculator.stage_distance_cache.stats()
+
+
+@router.delete("/flight-distance-cache")
+def clear_flight_distance_cache() -> dict[str, Any]:
+    """Clear flight stage distance cache and reset its counters"""
+    flight_calculator.stage_distance_cache.clear()
+    return flight_calculator.stage_distance_cache.stats()
+
+
+@router.get("/event-cost-cache")
+def read_event_cost_cache() -> dict[str, Any]:
+    """Get stored event cost response cache statistics"""
+    return event_cost_aggregator.event_costs_cache.stats()
+
+
+@router.delete("/event-cost-cache")
+def clear_event_cost_cache() -> dict[str, Any]:
+    """Clear stored event cost response cache and reset its counters"""
+    event_cost_aggregator.event_costs_cache.clear()
+    return event_cost_aggregator.event_costs_cache.stats()
+
+
+def _get_result_cache() -> CalculatorResultCache:
+    if result_cache is None:
+        raise HTTPException(status_code=404, detail="Result cache is disabled")
+
+    return result_cache
+
+
+@router.get("/result-cache")
+def read_result_cache() -> dict[str, Any]:
+    """Get calculator result cache statistics"""
+    return _get_result_cache().stats()
+
+
+@router.delete("/result-cache")
+def clear_result_cache() -> dict[str, Any]:
+    """Clear calculator result cache and reset its counters"""
+    cache = _get_result_cache()
+    cache.clear()
+    return cache.stats()
+
+
+@router.get("/db-pool")
+def read_db_pool() -> dict[str, Any]:
+    """Get database connection pool usage and checkout wait statistics"""
+    return {
+        "sync": pool_stats(engine.pool),
+        "async": pool_stats(async_engine.sync_engine.pool),
+    }
+
+
+@router.delete("/db-pool")
+def reset_db_pool_metrics() -> dict[str, Any]:
+    """Reset database connection pool checkout counters"""
+    engine.pool.metrics.reset()  # type: ignore
+    async_engine.sync_engine.pool.metrics.reset()  # type: ignore
+    return read_db_pool()
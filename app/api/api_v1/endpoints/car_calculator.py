@@ -1,5 +1,7 @@
 from enum import Enum
+from typing import Final
 
+import numpy as np
 from pydantic import BaseModel, Field, confloat
 
 from app.api.api_v1.calculator_interface import CalculatorInterface
@@ -62,6 +64,10 @@ class CarCalculatorResponse(BaseModel):
         title = "Car Calculator Response"
 
 
+# Average CO2 emissions of private cars, see `build_response` for sources
+car_co2_kg_per_km: Final[float] = 0.205
+
+
 def build_response(
     request: CarCalculatorRequest,
 ) -> CarCalculatorResponse:
@@ -81,7 +87,6 @@ def build_response(
     Consumption: 6.6L/100 km for diesel and 7.8L/100 km for petrol;
     Emissions factors: 3.07 kg of CO2/L for diesel and 2.71 kg of CO2/L for petrol
     """
-    car_co2_kg_per_km = 0.205
     total_carbon = car_co2_kg_per_km * request.distance
     return CarCalculatorResponse(total_carbon_kg=total_carbon)
 
@@ -92,10 +97,20 @@ async def car_calculator(request: CarCalculatorRequest) -> CarCalculatorResponse
     return response
 
 
+def car_calculator_batch(
+    requests: list[CarCalculatorRequest],
+) -> list[CarCalculatorResponse]:
+    """Calculate CO2 emissions for many car trips at once"""
+    distances = np.fromiter((r.distance for r in requests), dtype=np.float64)
+    total_carbon = car_co2_kg_per_km * distances
+    return [CarCalculatorResponse(total_carbon_kg=c) for c in total_carbon.tolist()]
+
+
 calculator_interface = CalculatorInterface(
     name="car_calculator",
     path="/car",
     entrypoint=car_calculator,
+    batch_entrypoint=car_calculator_batch,
     request_model=CarCalculatorRequest,
     response_model=CarCalculatorResponse,
     get_total_carbon_kg=lambda response: response.total_carbon_kg,
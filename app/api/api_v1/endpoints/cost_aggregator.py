@@ -1,12 +1,25 @@
-from typing import Any, Generic
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, AsyncIterator, Generic, Optional
 
 import pydantic
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, conlist, confloat
 from pydantic.generics import GenericModel
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
 
+from app.api import deps
+from app.api.api_v1.calculator_executor import calculator_executor
 from app.api.api_v1.calculator_interface import CalculatorInterface, RequestT, ResponseT
 from app.api.api_v1.calculators import calculators
+from app.core.config import settings
+from app.core.serialization import ORJSONResponse, dumps
+from app.schemas.common import DetailLevel, ResponseProjection
+
+logger = logging.getLogger("uvicorn.error")
 
 router = APIRouter()
 
@@ -50,6 +63,19 @@ class CostAggregatorResponse(BaseModel):
     cost_paths: conlist(CostPathResponse)
 
 
+def validate_request(calculator: CalculatorInterface, request: Any) -> BaseModel:
+    """Validate the request of a cost item against its calculator's request model
+
+    Requests built internally as instances of the request model are trusted and
+    passed through as-is, requests parsed from JSON are fully validated, a
+    request that is not an object raises a `pydantic.ValidationError`.
+    """
+    if isinstance(request, calculator.request_model):
+        return request
+
+    return calculator.request_model.parse_obj(request)
+
+
 def validate_request_paths(cost_paths: list[CostPath]) -> list[CostPathValidated]:
     calculators_by_name = calculators.calculators_by_name
     cost_paths_validated = []
@@ -62,8 +88,9 @@ def validate_request_paths(cost_paths: list[CostPath]) -> list[CostPathValidated
         for cost_item in cost_path.cost_items:
             try:
                 calculator = calculators_by_name[cost_item.calculator_name]
-                request = calculator.request_model(**cost_item.request)
-                validated_item = CostItemValidated(
+                request = validate_request(calculator, cost_item.request)
+                # Parts are validated already, skip re-validating the calculator
+                validated_item = CostItemValidated.construct(
                     item=cost_item, calculator=calculator, request=request
                 )
                 cost_items_validated.append(validated_item)
@@ -88,7 +115,9 @@ def validate_request_paths(cost_paths: list[CostPath]) -> list[CostPathValidated
 
         if len(cost_items_validated) != 0:
             cost_paths_validated.append(
-                CostPathValidated(title=title, cost_items=cost_items_validated)
+                CostPathValidated.construct(
+                    title=title, cost_items=cost_items_validated
+                )
             )
 
     if len(errors) != 0:
@@ -97,28 +126,339 @@ def validate_request_paths(cost_paths: list[CostPath]) -> list[CostPathValidated
     return cost_paths_validated
 
 
-@router.post("/cost-aggregator")
-async def cost_aggregator(request: CostAggregatorRequest) -> CostAggregatorResponse:
-    cost_paths = validate_request_paths(request.cost_paths)
-    cost_path_responses = []
+def build_cost_path_response(
+    cost_path: CostPathValidated,
+    responses: list[Any],
+) -> CostPathResponse:
+    cost_item_responses = []
+    total_carbon_kg = 0.0
+
+    for cost_item, response in zip(cost_path.cost_items, responses):
+        item, calculator = cost_item.item, cost_item.calculator
+        total_carbon_kg += calculator.get_total_carbon_kg(response)
+        item_response = CostItemResponse.construct(cost_item=item, response=response)
+        cost_item_responses.append(item_response)
+
+    return CostPathResponse.construct(
+        cost_items=cost_item_responses,
+        title=cost_path.title,
+        total_carbon_kg=total_carbon_kg,
+    )
+
+
+async def aggregate_cost_paths(
+    requests_cost_paths: list[list[CostPathValidated]],
+    projection: Optional[ResponseProjection] = None,
+) -> list[Any]:
+    """Run the cost items of many aggregator requests, batched per calculator
+
+    Cost items of all paths of all requests are grouped by calculator and each
+    calculator is called once with its whole batch, so that the calculation
+    overhead grows with the number of calculators rather than cost items.
+
+    Args:
+        requests_cost_paths: Validated cost paths of each aggregator request
+        projection: Parts of the responses to build, responses are built as
+            `CostAggregatorResponse` in full if None
+
+    Returns: Aggregator response of each request, in input order
+    """
+    batches: dict[str, list[CostItemValidated]] = defaultdict(list)
+
+    for cost_paths in requests_cost_paths:
+        for cost_path in cost_paths:
+            for cost_item in cost_path.cost_items:
+                batches[cost_item.calculator.name].append(cost_item)
+
+    batch_responses = await asyncio.gather(
+        *(
+            calculator_executor.run_batch(
+                batch[0].calculator, [cost_item.request for cost_item in batch]
+            )
+            for batch in batches.values()
+        )
+    )
+    responses_by_item = {
+        id(cost_item): response
+        for batch, responses in zip(batches.values(), batch_responses)
+        for cost_item, response in zip(batch, responses)
+    }
+
+    def path_responses(cost_path: CostPathValidated) -> list[Any]:
+        return [responses_by_item[id(item)] for item in cost_path.cost_items]
+
+    if projection is not None:
+        path_projection = projection.scoped("cost_paths")
+        return [
+            projection.project(
+                {
+                    "cost_paths": lambda cost_paths=cost_paths: [
+                        build_projected_cost_path_response(
+                            cost_path, path_responses(cost_path), path_projection
+                        )
+                        for cost_path in cost_paths
+                    ]
+                }
+            )
+            for cost_paths in requests_cost_paths
+        ]
+
+    return [
+        CostAggregatorResponse.construct(
+            cost_paths=[
+                build_cost_path_response(cost_path, path_responses(cost_path))
+                for cost_path in cost_paths
+            ]
+        )
+        for cost_paths in requests_cost_paths
+    ]
+
+
+def build_projected_cost_path_response(
+    cost_path: CostPathValidated,
+    responses: list[Any],
+    projection: ResponseProjection,
+) -> dict[str, Any]:
+    """Build the parts of a cost path response selected by a projection
+
+    Unlike `project_cost_path_response`, parts are built straight from the
+    calculator responses, those not selected are never built.
+    """
+    items = list(zip(cost_path.cost_items, responses))
+    fields = {
+        "title": lambda: cost_path.title,
+        "total_carbon_kg": lambda: sum(
+            (item.calculator.get_total_carbon_kg(response) for item, response in items),
+            0.0,
+        ),
+    }
+
+    if projection.detail == DetailLevel.full:
+        item_projection = projection.scoped("cost_items")
+        fields["cost_items"] = lambda: [
+            project_cost_item_response(
+                CostItemResponse.construct(cost_item=item.item, response=response),
+                item_projection,
+            )
+            for item, response in items
+        ]
+
+    return projection.project(fields)
+
+
+def project_cost_item_response(
+    item_response: CostItemResponse,
+    projection: ResponseProjection,
+) -> dict[str, Any]:
+    return projection.project(
+        {
+            "cost_item": lambda: item_response.cost_item,
+            "response": lambda: item_response.response,
+        }
+    )
+
+
+def project_cost_path_response(
+    path_response: CostPathResponse,
+    projection: ResponseProjection,
+) -> dict[str, Any]:
+    fields = {
+        "title": lambda: path_response.title,
+        "total_carbon_kg": lambda: path_response.total_carbon_kg,
+    }
+
+    if projection.detail == DetailLevel.full:
+        item_projection = projection.scoped("cost_items")
+        fields["cost_items"] = lambda: [
+            project_cost_item_response(item_response, item_projection)
+            for item_response in path_response.cost_items
+        ]
+
+    return projection.project(fields)
+
+
+def project_cost_aggregator_response(
+    response: CostAggregatorResponse,
+    projection: ResponseProjection,
+) -> dict[str, Any]:
+    """Build the parts of a response selected by a projection
+
+    Both `totals` and `paths` detail levels keep only the title and total of each
+    cost path.
+    """
+    path_projection = projection.scoped("cost_paths")
+    return projection.project(
+        {
+            "cost_paths": lambda: [
+                project_cost_path_response(path_response, path_projection)
+                for path_response in response.cost_paths
+            ]
+        }
+    )
 
-    for cost_path in cost_paths:
-        cost_item_responses = []
-        total_carbon_kg = 0.0
 
-        for cost_item in cost_path.cost_items:
-            item, calculator = cost_item.item, cost_item.calculator
-            response = await calculator.entrypoint(cost_item.request)
-            total_carbon_kg += calculator.get_total_carbon_kg(response)
-            item_response = CostItemResponse(cost_item=item, response=response)
-            cost_item_responses.append(item_response)
-
-        cost_path_responses.append(
-            CostPathResponse(
-                cost_items=cost_item_responses,
-                title=cost_path.title,
-                total_carbon_kg=total_carbon_kg,
-            )
+@router.post("/cost-aggregator")
+async def cost_aggregator(
+    request: CostAggregatorRequest,
+    projection: ResponseProjection = Depends(deps.get_response_projection),
+) -> Any:
+    cost_paths = validate_request_paths(request.cost_paths)
+    responses = await aggregate_cost_paths(
+        [cost_paths], None if projection.is_full else projection
+    )
+    return ORJSONResponse(responses[0])
+
+
+NDJSONLine = tuple[int, Optional[bytes]]
+
+
+async def read_ndjson_lines(request: Request) -> AsyncIterator[NDJSONLine]:
+    """Yield the non-empty lines of an NDJSON request body as they arrive
+
+    Lines longer than `COST_AGGREGATOR_BULK_MAX_LINE_BYTES` are yielded without
+    content and their remainder skipped, so a single line cannot exhaust memory.
+
+    Yields: Line number, starting at 1, and line content or None if too long
+    """
+    max_line_bytes = settings.COST_AGGREGATOR_BULK_MAX_LINE_BYTES
+    buffer = b""
+    line_number = 1
+    skipping = False
+
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b"\n")
+
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif len(line) > max_line_bytes:
+                yield line_number, None
+            elif line.strip():
+                yield line_number, line
+
+            line_number += 1
+
+        if len(buffer) > max_line_bytes:
+            if not skipping:
+                yield line_number, None
+
+            buffer = b""
+            skipping = True
+
+    if buffer.strip() and not skipping:
+        yield line_number, buffer
+
+
+async def aggregate_ndjson_chunk(
+    lines: list[NDJSONLine],
+    projection: ResponseProjection,
+) -> list[dict[str, Any]]:
+    """Validate and aggregate a chunk of NDJSON lines together
+
+    Returns: Result of each line, with either its `response` or its `error`
+    """
+    results = []
+    line_numbers = []
+    requests_cost_paths = []
+
+    for line_number, line in lines:
+        if line is None:
+            error = "Line exceeds COST_AGGREGATOR_BULK_MAX_LINE_BYTES"
+            results.append({"line": line_number, "error": error})
+            continue
+
+        try:
+            request = CostAggregatorRequest.parse_raw(line)
+            requests_cost_paths.append(validate_request_paths(request.cost_paths))
+            line_numbers.append(line_number)
+        except pydantic.ValidationError as error:
+            results.append({"line": line_number, "error": error.errors()})
+        except HTTPException as error:
+            results.append({"line": line_number, "error": error.detail})
+
+    # Only the parts of the responses selected are built
+    response_projection = None if projection.is_full else projection
+
+    try:
+        responses = await aggregate_cost_paths(requests_cost_paths, response_projection)
+    except Exception:
+        # Find the failing lines by calculating each line on its own
+        responses = await asyncio.gather(
+            *(
+                aggregate_cost_paths([cost_paths], response_projection)
+                for cost_paths in requests_cost_paths
+            ),
+            return_exceptions=True,
         )
 
-    return CostAggregatorResponse(cost_paths=cost_path_responses)
+    for line_number, response in zip(line_numbers, responses):
+        if isinstance(response, list):
+            response = response[0]
+
+        if isinstance(response, Exception):
+            logger.error("Bulk line %s calculation failed: %r", line_number, response)
+            error = f"Calculation failed: {type(response).__name__}"
+            results.append({"line": line_number, "error": error})
+        else:
+            results.append({"line": line_number, "response": response})
+
+    results.sort(key=lambda result: result["line"])
+    return results
+
+
+async def stream_bulk_results(
+    request: Request,
+    projection: ResponseProjection,
+) -> AsyncIterator[bytes]:
+    chunk_size = settings.COST_AGGREGATOR_BULK_CHUNK_SIZE
+    lines = []
+
+    async for line in read_ndjson_lines(request):
+        lines.append(line)
+
+        if len(lines) >= chunk_size:
+            for result in await aggregate_ndjson_chunk(lines, projection):
+                yield dumps(result) + b"\n"
+
+            lines = []
+
+    for result in await aggregate_ndjson_chunk(lines, projection):
+        yield dumps(result) + b"\n"
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """Streaming response whose content is produced while reading the request
+
+    StreamingResponse listens for the client disconnecting while streaming, and
+    that listener would consume the request body messages the content has not
+    read yet. Here, only the content receives messages, and a disconnect while
+    reading the request ends the response.
+    """
+
+    async def __call__(
+        self: "RequestStreamingResponse", scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        try:
+            await self.stream_response(send)
+        except ClientDisconnect:
+            logger.debug("Client disconnected while streaming its request")
+            return
+
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/cost-aggregator/bulk")
+async def cost_aggregator_bulk(
+    request: Request,
+    projection: ResponseProjection = Depends(deps.get_response_projection),
+) -> RequestStreamingResponse:
+    """Aggregate costs of many requests sent as NDJSON, one request per line
+
+    Lines are parsed as they arrive and processed in chunks of
+    `COST_AGGREGATOR_BULK_CHUNK_SIZE`. Results are streamed back as NDJSON once
+    each chunk completes, one object per input line holding its `line` number and
+    either its `response` or its `error`.
+    """
+    results = stream_bulk_results(request, projection)
+    return RequestStreamingResponse(results, media_type="application/x-ndjson")
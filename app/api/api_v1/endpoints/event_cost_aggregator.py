@@ -1,27 +1,48 @@
 import asyncio
-import itertools
-from typing import cast, Final, Callable
+import concurrent.futures
+from typing import Any, Hashable, Optional, Type
 
-import reverse_geocoder
-from fastapi import APIRouter
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
 from vc_calculator.interface import OnlineDetails, ConnectionTypes, KnownDevicesEnum
 
+from app import crud
+from app.api import deps
+from app.api.api_v1.calculator_executor import spawn_process_pool
 from app.api.api_v1.endpoints import flight_calculator
 from app.api.api_v1.endpoints import online_calculator as online
 from app.api.api_v1.endpoints.cost_aggregator import (
-    cost_aggregator,
-    CostAggregatorRequest,
+    aggregate_cost_paths,
+    project_cost_aggregator_response,
+    validate_request_paths,
     CostPath,
+    CostPathResponse,
     CostItem,
+    CostItemResponse,
     CostAggregatorResponse,
 )
 from app.api.api_v1.endpoints.flight_calculator import (
     FlightCalculatorRequest,
+    FlightCalculatorResponse,
     FlightStage,
+    FlightStageCarbonSummary,
 )
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.geocoding import search_iso_codes_array
+from app.core.http_cache import cached_response, make_etag
+from app.core.serialization import dumps
 from app.schemas import Event, Participant
-from app.schemas.common import GeoCoordinates, JoinMode
+from app.schemas.common import (
+    DetailLevel,
+    GeoCoordinates,
+    JoinMode,
+    ResponseProjection,
+)
 
 router = APIRouter()
 
@@ -39,22 +60,29 @@ class EventCostAggregatorResponse(BaseModel):
 
 
 def build_in_person_cost_path(
-    participant: Participant,
+    start: GeoCoordinates,
     end: GeoCoordinates,
+    start_iso_code: str,
+    end_iso_code: str,
 ) -> CostPath:
-    start = GeoCoordinates(lon=participant.lon, lat=participant.lat)
-
-    coordinates = [(start.lat, start.lon), (end.lat, end.lon)]
-    results = reverse_geocoder.search(coordinates)[:2]
-    flight_stage = FlightStage(start=start, end=end,
-                               start_iso_code=results[0]["cc"],
-                               end_iso_code=results[1]["cc"], one_way=False)
-    in_person_path = CostPath(
-        title=JoinMode.in_person,
+    """Cost path of a return flight from a participant to the event venue
+
+    The path and its request are typed models constructed without validation,
+    `validate_request_paths` passes them through without re-parsing.
+    """
+    flight_stage = FlightStage.construct(
+        start=start,
+        end=end,
+        start_iso_code=start_iso_code,
+        end_iso_code=end_iso_code,
+        one_way=False,
+    )
+    in_person_path = CostPath.construct(
+        title=JoinMode.in_person.value,
         cost_items=[
-            CostItem(
+            CostItem.construct(
                 calculator_name=flight_calculator.calculator_interface.name,
-                request=FlightCalculatorRequest(stages=[flight_stage]).dict(),
+                request=FlightCalculatorRequest.construct(stages=[flight_stage]),
             )
         ],
     )
@@ -70,71 +98,413 @@ def build_online_cost_path(total_participants: int) -> CostPath:
         software="linux",
         connection=ConnectionTypes.wifi,
     )
-    online_path = CostPath(
-        title=JoinMode.online,
+    online_path = CostPath.construct(
+        title=JoinMode.online.value,
         cost_items=[
-            CostItem(
+            CostItem.construct(
                 calculator_name=online.calculator_interface.name,
-                request=details.dict(),
+                request=details,
             )
         ],
     )
     return online_path
 
 
-def build_cost_aggregator_request(
-    participant: Participant,
-    end: GeoCoordinates,
-    total_participants: int,
-) -> CostAggregatorRequest:
-    in_person_path = build_in_person_cost_path(participant, end)
+def calculate_in_person_arrays(
+    end_lat: float,
+    end_lon: float,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    ellipse: str = "WGS84",
+    non_co2_effects_scaling: float = 1.9,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculate return flight costs of participants to an event venue
+
+    Participants are held as coordinate arrays: they are geocoded in a single
+    query, their distances computed in a single geodesic call and their
+    intensities looked up once per departure country. Arguments and results are
+    plain arrays so that shards can be calculated in worker processes.
+
+    Args:
+        end_lat: Latitude of event venue
+        end_lon: Longitude of event venue
+        lats: Latitudes of participants
+        lons: Longitudes of participants
+        ellipse: Ellipsoid defining the type of geodesic distance calculation
+        non_co2_effects_scaling: Additional scaling for the non-CO2 climate effects
+            of aviation, see `flight_calculator.calculate_carbon_stage`
+
+    Returns:
+        ISO codes of the venue followed by those of the participants, and the
+        flight distances and emitted CO2 in kg of each participant
+    """
+    # Geocode the venue once together with all participants
+    iso_codes = search_iso_codes_array(
+        np.append(end_lat, lats), np.append(end_lon, lons)
+    )
+
+    count = len(lats)
+    distances = flight_calculator.compute_distances(
+        lons,
+        lats,
+        np.full(count, end_lon),
+        np.full(count, end_lat),
+        np.zeros(count, dtype=bool),
+        flight_calculator.get_geod(ellipse),
+    )
+    kg_co2_per_km = flight_calculator.lookup_carbon_intensities_kg(iso_codes[1:])
+    carbon_kg = distances * kg_co2_per_km * non_co2_effects_scaling
+    return iso_codes, distances, carbon_kg
+
+
+_event_shard_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+
+def get_event_shard_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _event_shard_pool
+
+    if _event_shard_pool is None:
+        _event_shard_pool = spawn_process_pool(settings.EVENT_SHARD_WORKERS)
+
+    return _event_shard_pool
+
+
+def shutdown_event_shard_pool() -> None:
+    global _event_shard_pool
+
+    if _event_shard_pool is not None:
+        _event_shard_pool.shutdown(wait=True, cancel_futures=True)
+        _event_shard_pool = None
+
+
+class InPersonCosts:
+    def __init__(
+        self: "InPersonCosts",
+        end: GeoCoordinates,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        iso_codes: np.ndarray,
+        distances: np.ndarray,
+        carbon_kg: np.ndarray,
+    ) -> None:
+        """Return flight costs of all participants of an event to its venue
+
+        Args:
+            end: Event venue
+            lats: Latitudes of participants
+            lons: Longitudes of participants
+            iso_codes: ISO codes of the venue followed by those of the participants
+            distances: Flight distances of participants in km
+            carbon_kg: Emitted CO2 in kg of participants
+        """
+        self.end = end
+        self.lats = lats
+        self.lons = lons
+        self.end_iso_code = str(iso_codes[0])
+        self.start_iso_codes = iso_codes[1:]
+        self.distances = distances
+        self.carbon_kg = carbon_kg
+
+    @classmethod
+    def calculate(
+        cls: Type["InPersonCosts"],
+        end: GeoCoordinates,
+        lats: np.ndarray,
+        lons: np.ndarray,
+    ) -> "InPersonCosts":
+        arrays = calculate_in_person_arrays(end.lat, end.lon, lats, lons)
+        return cls(end, lats, lons, *arrays)
+
+    @classmethod
+    async def calculate_sharded(
+        cls: Type["InPersonCosts"],
+        end: GeoCoordinates,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        shard_size: int,
+    ) -> "InPersonCosts":
+        """Calculate costs in shards of participants across the event shard pool
+
+        The event loop stays free to serve other requests while shards are
+        calculated, their results are concatenated in participant order.
+        """
+        loop = asyncio.get_running_loop()
+        pool = get_event_shard_pool()
+        shards = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    pool,
+                    calculate_in_person_arrays,
+                    end.lat,
+                    end.lon,
+                    lats[i : i + shard_size],
+                    lons[i : i + shard_size],
+                )
+                for i in range(0, len(lats), shard_size)
+            )
+        )
+        # Every shard starts with the venue's ISO code, keep only the first
+        end_iso_code = shards[0][0][:1]
+        iso_codes = np.concatenate(
+            [end_iso_code, *(iso_codes[1:] for iso_codes, _, _ in shards)]
+        )
+        distances = np.concatenate([distances for _, distances, _ in shards])
+        carbon_kg = np.concatenate([carbon_kg for _, _, carbon_kg in shards])
+        return cls(end, lats, lons, iso_codes, distances, carbon_kg)
+
+    def __len__(self: "InPersonCosts") -> int:
+        return len(self.carbon_kg)
+
+    def build_cost_path_responses(self: "InPersonCosts") -> list[CostPathResponse]:
+        """Build the in-person cost path response of each participant"""
+        calculator_name = flight_calculator.calculator_interface.name
+        title = JoinMode.in_person.value
+        rows = zip(
+            self.lats.tolist(),
+            self.lons.tolist(),
+            self.start_iso_codes.tolist(),
+            self.distances.tolist(),
+            self.carbon_kg.tolist(),
+        )
+        responses = []
+
+        for lat, lon, start_iso_code, distance, carbon_kg in rows:
+            stage = FlightStage.construct(
+                start=GeoCoordinates.construct(lat=lat, lon=lon),
+                end=self.end,
+                start_iso_code=start_iso_code,
+                end_iso_code=self.end_iso_code,
+                one_way=False,
+            )
+            summary = FlightStageCarbonSummary.construct(
+                stage=stage, distance=distance, carbon_kg=carbon_kg
+            )
+            cost_item = CostItem.construct(
+                calculator_name=calculator_name,
+                request=FlightCalculatorRequest.construct(stages=[stage]),
+            )
+            item_response = CostItemResponse.construct(
+                cost_item=cost_item,
+                response=FlightCalculatorResponse.construct(
+                    stages=[summary], total_carbon_kg=carbon_kg
+                ),
+            )
+            responses.append(
+                CostPathResponse.construct(
+                    title=title, total_carbon_kg=carbon_kg, cost_items=[item_response]
+                )
+            )
+
+        return responses
+
+
+async def calculate_online_cost_path(total_participants: int) -> CostPathResponse:
+    """Calculate the online cost path shared by all participants of an event"""
     online_path = build_online_cost_path(total_participants)
-    return CostAggregatorRequest(cost_paths=[in_person_path, online_path])
+    (response,) = await aggregate_cost_paths([validate_request_paths([online_path])])
+    return response.cost_paths[0]
+
+
+def build_participant_responses(
+    in_person_costs: InPersonCosts,
+    online_path: CostPathResponse,
+) -> list[CostAggregatorResponse]:
+    return [
+        CostAggregatorResponse.construct(cost_paths=[in_person_path, online_path])
+        for in_person_path in in_person_costs.build_cost_path_responses()
+    ]
+
+
+def is_large_event(participants_count: int) -> bool:
+    """Whether an event is large enough to be calculated in shards"""
+    threshold = settings.EVENT_SHARD_THRESHOLD
+    return 0 < threshold <= participants_count
+
 
+async def encode_event_costs(content: Any, participants_count: int) -> bytes:
+    """Encode event costs, in a worker thread for large events
 
-def build_cost_aggregator_requests(
+    The encoder calls back into Python for every nested model, so the thread
+    regularly yields the GIL to the event loop.
+    """
+    if is_large_event(participants_count):
+        return await run_in_threadpool(dumps, content)
+
+    return dumps(content)
+
+
+async def compute_event_costs(
     request: EventCostAggregatorRequest,
-) -> list[CostAggregatorRequest]:
+    include_participants: bool = True,
+) -> EventCostAggregatorResponse:
+    """Calculate the costs of an event with all participants at once
+
+    In-person costs are calculated as arrays, see `InPersonCosts`, and the online
+    cost, which is the same for every participant, is calculated once. Large
+    events, see `is_large_event`, are calculated in shards off the event loop.
+
+    Args:
+        request: Event and participants to calculate costs for
+        include_participants: Whether to build the response of each participant,
+            only the event totals are calculated otherwise
+
+    Returns: Event totals and the cost paths of each participant
+    """
     event = request.event
     participants = request.participants
+    count = len(participants)
+
+    if count == 0:
+        return EventCostAggregatorResponse.construct(
+            in_person_total_carbon_kg=0.0,
+            online_total_carbon_kg=0.0,
+            actual_total_carbon_kg=0.0,
+            participant_cost_aggregator_responses=[],
+        )
+
     end = GeoCoordinates(lon=event.lon, lat=event.lat)
-    total_participants = len(participants)
-    requests = [
-        build_cost_aggregator_request(participant, end, total_participants)
-        for participant in participants
-    ]
-    return requests
+    lats = np.fromiter((p.lat for p in participants), dtype=np.float64, count=count)
+    lons = np.fromiter((p.lon for p in participants), dtype=np.float64, count=count)
+    join_modes = np.array([JoinMode(p.join_mode).value for p in participants])
+    sharded = is_large_event(count)
 
+    if sharded:
+        in_person_costs = await InPersonCosts.calculate_sharded(
+            end, lats, lons, settings.EVENT_SHARD_SIZE
+        )
+    else:
+        in_person_costs = InPersonCosts.calculate(end, lats, lons)
 
-def merge_cost_aggregator_responses(request: EventCostAggregatorResponse, responses: list[CostAggregatorResponse]):
-    def sum_cost_path_filter(select: Callable[[CostPath, Participant], bool]):
-        cost_paths = itertools.chain.from_iterable(
-            (
-                (cp.total_carbon_kg for cp in response.cost_paths if select(cp, participant))
-                for response, participant in zip(responses, request.participants)
-            )
+    online_path = await calculate_online_cost_path(count)
+    online_carbon_kg = online_path.total_carbon_kg
+
+    in_person_carbon_kg = in_person_costs.carbon_kg
+    attending = join_modes == JoinMode.in_person.value
+    online_count = int(np.count_nonzero(join_modes == JoinMode.online.value))
+    actual_total = (
+        in_person_carbon_kg[attending].sum() + online_count * online_carbon_kg
+    )
+
+    participant_responses = []
+
+    if include_participants and sharded:
+        # Building responses of large events would otherwise block the loop
+        participant_responses = await run_in_threadpool(
+            build_participant_responses, in_person_costs, online_path
+        )
+    elif include_participants:
+        participant_responses = build_participant_responses(
+            in_person_costs, online_path
         )
-        return sum(cost_paths)
 
-    in_person_total = sum_cost_path_filter(lambda cp, _: cp.title == JoinMode.in_person)
-    online_total = sum_cost_path_filter(lambda cp, _: cp.title == JoinMode.online)
-    actual_total = sum_cost_path_filter(lambda cp, participant: cp.title == participant.join_mode)
+    return EventCostAggregatorResponse.construct(
+        in_person_total_carbon_kg=float(in_person_carbon_kg.sum()),
+        online_total_carbon_kg=count * online_carbon_kg,
+        actual_total_carbon_kg=float(actual_total),
+        participant_cost_aggregator_responses=participant_responses,
+    )
+
+
+def project_event_cost_aggregator_response(
+    response: EventCostAggregatorResponse,
+    projection: ResponseProjection,
+) -> dict[str, Any]:
+    """Build the parts of a response selected by a projection
+
+    The `totals` detail level keeps only the event totals, `paths` adds the title
+    and total of each participant's cost paths.
+    """
+    fields = {
+        "in_person_total_carbon_kg": lambda: response.in_person_total_carbon_kg,
+        "online_total_carbon_kg": lambda: response.online_total_carbon_kg,
+        "actual_total_carbon_kg": lambda: response.actual_total_carbon_kg,
+    }
+
+    if projection.detail != DetailLevel.totals:
+        field = "participant_cost_aggregator_responses"
+        participant_projection = projection.scoped(field)
+        fields[field] = lambda: [
+            project_cost_aggregator_response(participant, participant_projection)
+            for participant in response.participant_cost_aggregator_responses
+        ]
 
-    return EventCostAggregatorResponse(
-        in_person_total_carbon_kg=in_person_total,
-        online_total_carbon_kg=online_total,
-        actual_total_carbon_kg=actual_total,
-        participant_cost_aggregator_responses=responses,
+    return projection.project(fields)
+
+
+def wants_participant_responses(projection: ResponseProjection) -> bool:
+    """Whether participant responses need to be computed for a projection"""
+    return projection.detail != DetailLevel.totals and projection.wants(
+        "participant_cost_aggregator_responses"
     )
 
 
 @router.post("/", response_model=EventCostAggregatorResponse)
 async def event_cost_aggregator(
     request: EventCostAggregatorRequest,
-) -> EventCostAggregatorResponse:
-    requests = build_cost_aggregator_requests(request)
-    response_futures = [cost_aggregator(req) for req in requests]
-    responses = await asyncio.gather(*response_futures)
-    responses = cast(list[CostAggregatorResponse], responses)
-    response = merge_cost_aggregator_responses(request, responses)
-    return response
+    projection: ResponseProjection = Depends(deps.get_response_projection),
+) -> Any:
+    include_participants = wants_participant_responses(projection)
+    response = await compute_event_costs(request, include_participants)
+
+    if projection.is_full:
+        content = response
+    else:
+        content = project_event_cost_aggregator_response(response, projection)
+
+    body = await encode_event_costs(content, len(request.participants))
+    return Response(body, media_type="application/json")
+
+
+EventCostsKey = tuple[int, int, Hashable]
+
+# Encoded responses and their ETags by event ID, event version and projection
+event_costs_cache: LRUCache[EventCostsKey, tuple[bytes, str]] = LRUCache(
+    maxsize=settings.EVENT_COST_CACHE_SIZE
+)
+
+
+def load_event(db: Session, event_id: int) -> Event:
+    db_event = crud.event.get_with_participants(db=db, id=event_id)
+    return Event.from_orm(db_event)
+
+
+@router.get("/{event_id}", response_model=EventCostAggregatorResponse)
+async def read_event_cost_aggregator(
+    event_id: int,
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    projection: ResponseProjection = Depends(deps.get_response_projection),
+) -> Response:
+    """Aggregate the costs of a stored event and all of its participants
+
+    Responses are cached until the event or one of its participants changes,
+    clients revalidating with the response's ETag get a 304 while it is current.
+    """
+    version = await run_in_threadpool(crud.event.get_version, db, event_id)
+
+    if version is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    cached = event_costs_cache.get((event_id, version, projection.cache_key))
+
+    if cached is None:
+        event = await run_in_threadpool(load_event, db, event_id)
+        event_request = EventCostAggregatorRequest.construct(
+            event=event, participants=event.participants
+        )
+        include_participants = wants_participant_responses(projection)
+        response = await compute_event_costs(event_request, include_participants)
+
+        if projection.is_full:
+            content = response
+        else:
+            content = project_event_cost_aggregator_response(response, projection)
+
+        body = await encode_event_costs(content, len(event.participants))
+
+        # Keyed on the version loaded with the participants, which may be newer
+        cached = (body, make_etag(body))
+        event_costs_cache.set((event_id, event.version, projection.cache_key), cached)
+
+    body, etag = cached
+    return cached_response(request, body, etag, cache_control="no-cache")
@@ -1,14 +1,64 @@
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
+from starlette.responses import StreamingResponse
 
-from app import crud, schemas
+from app import crud, models, schemas
 from app.api import deps
+from app.api.export import ndjson_export_response
+from app.schemas.common import ParticipantsMode
 
 router = APIRouter()
 
 
+def _without_participants(
+    db: Session,
+    events: list[models.Event],
+    participants: ParticipantsMode,
+) -> list[dict[str, Any]]:
+    """Summaries of events, validated by the endpoints' response model"""
+    fields = schemas.EventSummary.__fields__
+    summaries = [{name: getattr(event, name) for name in fields} for event in events]
+
+    if participants == ParticipantsMode.count:
+        ids = [summary["id"] for summary in summaries]
+        counts = crud.event.get_participant_counts(db, ids=ids)
+
+        for summary in summaries:
+            summary["participants_count"] = counts.get(summary["id"], 0)
+
+    return summaries
+
+
+@router.get("/page", response_model=schemas.EventPage)
+def read_events_page(
+    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    participants: ParticipantsMode = ParticipantsMode.full,
+) -> Any:
+    """Retrieve events by page, pass `next_cursor` to get the next page
+
+    With `participants` set to "none" or "count", events are returned without
+    their participants, or with their number only.
+    """
+    items, next_cursor = crud.event.get_page(
+        db=db, cursor=cursor, limit=limit, participants=participants
+    )
+
+    if participants != ParticipantsMode.full:
+        items = _without_participants(db, items, participants)
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/export")
+def export_events() -> StreamingResponse:
+    """Stream all events as NDJSON, one event per line"""
+    return ndjson_export_response(crud.event, schemas.Event)
+
+
 @router.get("/{id}", response_model=schemas.Event)
 def read_event(
     *,
@@ -20,15 +70,26 @@ def read_event(
     return result
 
 
-@router.get("/", response_model=list[schemas.Event])
+@router.get("/", response_model=schemas.EventList)
 def read_events(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    participants: ParticipantsMode = ParticipantsMode.full,
 ) -> Any:
-    """Retrieve events"""
-    result = crud.event.get_multi(db=db, skip=skip, limit=limit)
-    return result
+    """Retrieve events
+
+    With `participants` set to "none" or "count", events are returned without
+    their participants, or with their number only.
+    """
+    result = crud.event.get_multi(
+        db=db, skip=skip, limit=limit, participants=participants
+    )
+
+    if participants == ParticipantsMode.full:
+        return result
+
+    return _without_participants(db, result, participants)
 
 
 @router.post("/", response_model=schemas.Event)
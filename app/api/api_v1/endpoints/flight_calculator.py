@@ -1,7 +1,13 @@
+import functools
+from typing import Final, Sequence
+
+import numpy as np
 import pyproj
 from pydantic import BaseModel, conlist, confloat
 
 from app.api.api_v1.calculator_interface import CalculatorInterface
+from app.core.cache import LRUCache
+from app.core.config import settings
 from app.schemas.common import GeoCoordinates
 
 
@@ -28,6 +34,66 @@ class FlightCalculatorResponse(BaseModel):
     total_carbon_kg: confloat(ge=0.0)
 
 
+# Flight CO2 intensities in g/km by departure country, see `lookup_carbon_intensity_kg`
+carbon_intensities_grams: Final[dict[str, float]] = {
+    "AE": 89,
+    "AI": 87,
+    "AS": 95,
+    "AU": 90,
+    "BM": 87,
+    "CC": 90,
+    "CN": 88,
+    "CX": 90,
+    "DE": 91,
+    "ES": 79,
+    "FK": 87,
+    "FR": 87,
+    "GB": 87,
+    "GF": 87,
+    "GG": 87,
+    "GI": 87,
+    "GP": 87,
+    "GU": 95,
+    "HK": 88,
+    "IM": 87,
+    "IN": 85,
+    "JP": 95,
+    "KY": 87,
+    "MP": 95,
+    "MQ": 87,
+    "MS": 87,
+    "NC": 87,
+    "NF": 90,
+    "PF": 87,
+    "PM": 87,
+    "PR": 95,
+    "RE": 87,
+    "SH": 87,
+    "TC": 87,
+    "UM": 95,
+    "US": 95,
+    "VG": 87,
+    "VI": 95,
+    "WF": 87,
+    "YT": 87,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_geod(ellipse: str = "WGS84") -> pyproj.Geod:
+    """Get a shared proj geodesic distance calculator for an ellipsoid
+
+    Building a `pyproj.Geod` parses the ellipsoid definition, so instances are
+    created once per ellipsoid and reused across requests.
+
+    Args:
+        ellipse: Ellipsoid defining the type of geodesic distance calculation
+
+    Returns: proj geodesic distance calculator
+    """
+    return pyproj.Geod(ellps=ellipse)
+
+
 def extend_flight_distance(distance: float) -> float:
     """Add factor to shortest flight distance to account for indirect flight paths
 
@@ -49,7 +115,23 @@ def extend_flight_distance(distance: float) -> float:
     return distance + 125
 
 
-def get_stage_distance(stage: FlightStage, geod: pyproj.Geod) -> float:
+def extend_flight_distances(distances: np.ndarray) -> np.ndarray:
+    """Vectorized version of `extend_flight_distance`
+
+    Args:
+        distances: Shortest distances - geodesic or Great Circle - between points in km
+
+    Returns: Distances with additional correction factor
+    """
+    corrections = np.select(
+        [distances < 550, distances < 5500],
+        [50.0, 100.0],
+        default=125.0,
+    )
+    return distances + corrections
+
+
+def compute_stage_distance(stage: FlightStage, geod: pyproj.Geod) -> float:
     """Calculate geodesic or great circle distances of flight stage
 
     Args:
@@ -65,6 +147,146 @@ def get_stage_distance(stage: FlightStage, geod: pyproj.Geod) -> float:
     return distance if stage.one_way else distance * 2
 
 
+def compute_stage_distances(
+    stages: Sequence[FlightStage],
+    geod: pyproj.Geod,
+) -> np.ndarray:
+    """Calculate geodesic or great circle distances of many flight stages at once
+
+    All stage coordinates are packed into arrays so that proj is called once for
+    the whole itinerary rather than once per stage.
+
+    Args:
+        stages: Flight stages to calculate distances for
+        geod: proj geodesic distance calculator
+
+    Returns:
+        Distances between stage start and end points, multiplied by two for
+        return flights
+    """
+    coordinates = np.array(
+        [(s.start.lon, s.start.lat, s.end.lon, s.end.lat) for s in stages],
+        dtype=np.float64,
+    ).reshape(-1, 4)
+    one_way = np.fromiter((s.one_way for s in stages), dtype=bool, count=len(stages))
+    start_lons, start_lats, end_lons, end_lats = np.ascontiguousarray(coordinates.T)
+    return compute_distances(start_lons, start_lats, end_lons, end_lats, one_way, geod)
+
+
+def compute_distances(
+    start_lons: np.ndarray,
+    start_lats: np.ndarray,
+    end_lons: np.ndarray,
+    end_lats: np.ndarray,
+    one_way: np.ndarray,
+    geod: pyproj.Geod,
+) -> np.ndarray:
+    """Calculate flight distances between arrays of start and end points
+
+    Args:
+        start_lons: Longitudes of start points
+        start_lats: Latitudes of start points
+        end_lons: Longitudes of end points
+        end_lats: Latitudes of end points
+        one_way: Whether each flight is one way, return flights are counted twice
+        geod: proj geodesic distance calculator
+
+    Returns: Extended flight distances in km
+    """
+    distances = geod.inv(start_lons, start_lats, end_lons, end_lats)[2] / 1000
+    distances = extend_flight_distances(np.asarray(distances))
+    return np.where(one_way, distances, distances * 2)
+
+
+StageDistanceKey = tuple[float, float, float, float, float, float, bool]
+
+stage_distance_cache: LRUCache[StageDistanceKey, float] = LRUCache(
+    maxsize=settings.FLIGHT_DISTANCE_CACHE_SIZE
+)
+
+
+def get_stage_distance_cache_key(
+    stage: FlightStage,
+    geod: pyproj.Geod,
+) -> StageDistanceKey:
+    """Build the distance cache key of a flight stage
+
+    Coordinates are rounded to `FLIGHT_DISTANCE_CACHE_PRECISION` decimal places so
+    that nearby points share an entry, and the ellipsoid is identified by its
+    semi-major axis and flattening.
+
+    Args:
+        stage: Flight stage to build key for
+        geod: proj geodesic distance calculator
+
+    Returns: Hashable key of quantized coordinates, ellipsoid and return flag
+    """
+    precision = settings.FLIGHT_DISTANCE_CACHE_PRECISION
+    start, end = stage.start, stage.end
+    return (
+        round(start.lon, precision),
+        round(start.lat, precision),
+        round(end.lon, precision),
+        round(end.lat, precision),
+        geod.a,
+        geod.f,
+        stage.one_way,
+    )
+
+
+def get_stage_distance(stage: FlightStage, geod: pyproj.Geod) -> float:
+    """Calculate distance of flight stage, served from the distance cache if possible
+
+    Args:
+        stage: Flight stage to calculate distance for
+        geod: proj geodesic distance calculator
+
+    Returns:
+        Distance between stage start and end point, multiplied by two if return flight
+    """
+    if not stage_distance_cache.enabled:
+        return compute_stage_distance(stage, geod)
+
+    key = get_stage_distance_cache_key(stage, geod)
+    distance = stage_distance_cache.get(key)
+
+    if distance is None:
+        distance = compute_stage_distance(stage, geod)
+        stage_distance_cache.set(key, distance)
+
+    return distance
+
+
+def get_stage_distances(stages: Sequence[FlightStage], geod: pyproj.Geod) -> np.ndarray:
+    """Calculate distances of flight stages, served from the distance cache if possible
+
+    Only stages missing from the cache are computed, in a single batched call.
+
+    Args:
+        stages: Flight stages to calculate distances for
+        geod: proj geodesic distance calculator
+
+    Returns:
+        Distances between stage start and end points, multiplied by two for
+        return flights
+    """
+    if not stage_distance_cache.enabled:
+        return compute_stage_distances(stages, geod)
+
+    keys = [get_stage_distance_cache_key(stage, geod) for stage in stages]
+    distances = [stage_distance_cache.get(key) for key in keys]
+    missing = [i for i, distance in enumerate(distances) if distance is None]
+
+    if len(missing) != 0:
+        computed = compute_stage_distances([stages[i] for i in missing], geod)
+
+        for i, distance in zip(missing, computed.tolist()):
+            distances[i] = distance
+            stage_distance_cache.set(keys[i], distance)
+
+    return np.array(distances, dtype=np.float64)
+
+
 def lookup_carbon_intensity_kg(
     iso_code: str,
     default_intensity_grams: float = 89.0,
@@ -83,52 +305,40 @@ def lookup_carbon_intensity_kg(
 
     Returns: CO2 intensity in kg/km flown of a flight originating from departure country
     """
-    intensities = {
-        "AE": 89,
-        "AI": 87,
-        "AS": 95,
-        "AU": 90,
-        "BM": 87,
-        "CC": 90,
-        "CN": 88,
-        "CX": 90,
-        "DE": 91,
-        "ES": 79,
-        "FK": 87,
-        "FR": 87,
-        "GB": 87,
-        "GF": 87,
-        "GG": 87,
-        "GI": 87,
-        "GP": 87,
-        "GU": 95,
-        "HK": 88,
-        "IM": 87,
-        "IN": 85,
-        "JP": 95,
-        "KY": 87,
-        "MP": 95,
-        "MQ": 87,
-        "MS": 87,
-        "NC": 87,
-        "NF": 90,
-        "PF": 87,
-        "PM": 87,
-        "PR": 95,
-        "RE": 87,
-        "SH": 87,
-        "TC": 87,
-        "UM": 95,
-        "US": 95,
-        "VG": 87,
-        "VI": 95,
-        "WF": 87,
-        "YT": 87,
-    }
-    intensity_grams = intensities.get(iso_code, default_intensity_grams)
+    intensity_grams = carbon_intensities_grams.get(iso_code, default_intensity_grams)
     return intensity_grams / 1000
 
 
+def lookup_carbon_intensities_kg(
+    iso_codes: Sequence[str],
+    default_intensity_grams: float = 89.0,
+) -> np.ndarray:
+    """Vectorized version of `lookup_carbon_intensity_kg`
+
+    Each distinct departure country is looked up once and broadcast back to the
+    stages departing from it.
+
+    Args:
+        iso_codes: Flight departure countries
+        default_intensity_grams: Default value departure countries not explicitly
+            enumerated in paper
+
+    Returns: CO2 intensities in kg/km flown of flights originating from each country
+    """
+    if len(iso_codes) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    unique_codes, inverse = np.unique(np.asarray(iso_codes), return_inverse=True)
+    unique_grams = np.array(
+        [
+            carbon_intensities_grams.get(str(code), default_intensity_grams)
+            for code in unique_codes
+        ],
+        dtype=np.float64,
+    )
+    return unique_grams[inverse] / 1000
+
+
 def calculate_carbon_stage(
     stage: FlightStage,
     geod: pyproj.Geod,
@@ -166,18 +376,31 @@ def calculate_carbon_stage(
 def calculate_carbon_stages(
     request: FlightCalculatorRequest,
     ellipse: str = "WGS84",
+    non_co2_effects_scaling: float = 1.9,
 ) -> list[FlightStageCarbonSummary]:
     """Calculate CO2 for all flight stages
 
+    Distances, detour corrections and carbon intensities are computed for all
+    stages at once, see `calculate_carbon_stage` for the per-stage method.
+
     Args:
         request: Flight CO2 calculation request
         ellipse: Ellipsoid defining the  type of geodesic distance calculation
+        non_co2_effects_scaling: Additional scaling for the non-CO2 climate effects of aviation
 
     Returns:
         List of summaries for CO2 emissions from each flight stage
     """
-    geod = pyproj.Geod(ellps=ellipse)
-    return [calculate_carbon_stage(stage, geod) for stage in request.stages]
+    stages = request.stages
+    geod = get_geod(ellipse)
+    distances = get_stage_distances(stages, geod)
+    kg_co2_per_km = lookup_carbon_intensities_kg([s.start_iso_code for s in stages])
+    carbon_kg = distances * kg_co2_per_km * non_co2_effects_scaling
+    summaries = zip(stages, distances.tolist(), carbon_kg.tolist())
+    return [
+        FlightStageCarbonSummary(stage=stage, distance=distance, carbon_kg=carbon)
+        for stage, distance, carbon in summaries
+    ]
 
 
 def build_response(
@@ -190,7 +413,7 @@ def build_response(
     )
 
 
-async def flight_calculator(
+def flight_calculator(
     request: FlightCalculatorRequest,
 ) -> FlightCalculatorResponse:
     """Calculate CO2 emissions for a series of flights"""
@@ -199,11 +422,34 @@ async def flight_calculator(
     return response
 
 
+def flight_calculator_batch(
+    requests: list[FlightCalculatorRequest],
+) -> list[FlightCalculatorResponse]:
+    """Calculate CO2 emissions for many series of flights at once
+
+    The stages of all requests are calculated together in one batch.
+    """
+    stages = [stage for request in requests for stage in request.stages]
+    combined_request = FlightCalculatorRequest.construct(stages=stages)
+    stage_summaries = calculate_carbon_stages(combined_request)
+    responses = []
+    start = 0
+
+    for request in requests:
+        end = start + len(request.stages)
+        responses.append(build_response(stage_summaries[start:end]))
+        start = end
+
+    return responses
+
+
 calculator_interface = CalculatorInterface(
     name="flight_calculator",
     path="/flight",
     entrypoint=flight_calculator,
+    batch_entrypoint=flight_calculator_batch,
     request_model=FlightCalculatorRequest,
     response_model=FlightCalculatorResponse,
     get_total_carbon_kg=lambda response: response.total_carbon_kg,
+    cpu_bound=True,
 )
@@ -1,8 +1,18 @@
 from fastapi import APIRouter
 
+from app.core.serialization import ORJSONResponse
+from app.core.warmup import warmup
+
 router = APIRouter()
 
 
 @router.get("/")
 def health_check() -> dict[str, str]:
     return {"status": "OK"}
+
+
+@router.get("/ready")
+def ready() -> ORJSONResponse:
+    """Report warm-up progress, with status 503 until warm-up has finished"""
+    status_code = 200 if warmup.ready else 503
+    return ORJSONResponse(warmup.status(), status_code=status_code)
@@ -15,6 +15,24 @@ async def online_calculator(
     return results
 
 
+async def online_calculator_batch(
+    bodies: list[online.OnlineDetails],
+) -> list[online.OnlineCalculatorResponse]:
+    """Calculate CO2 emissions for many online video calls
+
+    Identical calls, such as those of all online participants of an event, are
+    only calculated once.
+    """
+    keys = [body.json() for body in bodies]
+    results: dict[str, online.OnlineCalculatorResponse] = {}
+
+    for key, body in zip(keys, bodies):
+        if key not in results:
+            results[key] = await online_calculator(body)
+
+    return [results[key] for key in keys]
+
+
 def get_total_carbon_kg(response: online.OnlineCalculatorResponse) -> float:
     emissions = response.total_emissions
     return statistics.mean([emissions.low, emissions.high])
@@ -24,6 +42,7 @@ calculator_interface = CalculatorInterface(
     name="online_calculator",
     path="/online",
     entrypoint=online_calculator,
+    batch_entrypoint=online_calculator_batch,
     request_model=online.OnlineDetails,
     response_model=online.OnlineCalculatorResponse,
     get_total_carbon_kg=get_total_carbon_kg,
@@ -1,14 +1,33 @@
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
+from starlette.responses import StreamingResponse
 
 from app import crud, schemas
 from app.api import deps
+from app.api.export import ndjson_export_response
 
 router = APIRouter()
 
 
+@router.get("/page", response_model=schemas.Page[schemas.Participant])
+def read_participants_page(
+    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+) -> Any:
+    """Retrieve participants by page, pass `next_cursor` to get the next page"""
+    items, next_cursor = crud.participant.get_page(db=db, cursor=cursor, limit=limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/export")
+def export_participants() -> StreamingResponse:
+    """Stream all participants as NDJSON, one participant per line"""
+    return ndjson_export_response(crud.participant, schemas.Participant)
+
+
 @router.get("/{id}", response_model=schemas.Participant)
 def read_participant(
     *,
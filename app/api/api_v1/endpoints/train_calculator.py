@@ -1,5 +1,7 @@
 from enum import Enum
+from typing import Any, Final
 
+import numpy as np
 from pydantic import BaseModel, Field, confloat
 
 from app.api.api_v1.calculator_interface import CalculatorInterface
@@ -54,56 +56,58 @@ class TrainCalculatorResponse(BaseModel):
         title = "Train Calculator Response"
 
 
+carbon_intensities: Final[dict[RailwayCompany, dict[TrainType, dict[str, Any]]]] = {
+    RailwayCompany.SBB: {
+        TrainType.Unknown: {
+            "CO2 [g/km]": 7.0,
+            "source": "https://news.sbb.ch/artikel/89400/bye-bye-co2",
+        }
+    },
+    RailwayCompany.SNCF: {
+        TrainType.Alleo: {
+            "CO2 [g/km]": 11.3,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.Elipsos: {
+            "CO2 [g/km]": 27.0,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.Eurostar: {
+            "CO2 [g/km]": 11.2,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.Gala: {
+            "CO2 [g/km]": 12.0,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.Intercity: {
+            "CO2 [g/km]": 11.8,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.TER: {
+            "CO2 [g/km]": 29.2,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.TGV: {
+            "CO2 [g/km]": 3.2,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.Thalys: {
+            "CO2 [g/km]": 11.6,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+        TrainType.Transilien: {
+            "CO2 [g/km]": 6.4,
+            "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
+        },
+    },
+}
+
+
 def lookup_carbon_intensity_grams(
     request: TrainCalculatorRequest,
     default_co2_g_per_km: float = 10.0,
 ) -> float:
-    carbon_intensities = {
-        RailwayCompany.SBB: {
-            TrainType.Unknown: {
-                "CO2 [g/km]": 7.0,
-                "source": "https://news.sbb.ch/artikel/89400/bye-bye-co2",
-            }
-        },
-        RailwayCompany.SNCF: {
-            TrainType.Alleo: {
-                "CO2 [g/km]": 11.3,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.Elipsos: {
-                "CO2 [g/km]": 27.0,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.Eurostar: {
-                "CO2 [g/km]": 11.2,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.Gala: {
-                "CO2 [g/km]": 12.0,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.Intercity: {
-                "CO2 [g/km]": 11.8,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.TER: {
-                "CO2 [g/km]": 29.2,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.TGV: {
-                "CO2 [g/km]": 3.2,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.Thalys: {
-                "CO2 [g/km]": 11.6,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-            TrainType.Transilien: {
-                "CO2 [g/km]": 6.4,
-                "source": "https://ch.oui.sncf/en/help-ch/calculation-co2-emissions-your-train-journey",
-            },
-        },
-    }
     train_details = carbon_intensities.get(request.railway_company, {}).get(
         request.train_type, {}
     )
@@ -123,10 +127,24 @@ def train_calculator(request: TrainCalculatorRequest) -> TrainCalculatorResponse
     return response
 
 
+def train_calculator_batch(
+    requests: list[TrainCalculatorRequest],
+) -> list[TrainCalculatorResponse]:
+    """Calculate CO2 emissions for many train trips at once"""
+    count = len(requests)
+    co2_g_per_km = np.fromiter(
+        (lookup_carbon_intensity_grams(r) for r in requests), np.float64, count
+    )
+    distances = np.fromiter((r.distance for r in requests), np.float64, count)
+    total_carbon_kg = (co2_g_per_km / 1000 * distances).tolist()
+    return [TrainCalculatorResponse(total_carbon_kg=c) for c in total_carbon_kg]
+
+
 calculator_interface = CalculatorInterface(
     name="train_calculator",
     path="/train",
     entrypoint=train_calculator,
+    batch_entrypoint=train_calculator_batch,
     request_model=TrainCalculatorRequest,
     response_model=TrainCalculatorResponse,
     get_total_carbon_kg=lambda response: response.total_carbon_kg,
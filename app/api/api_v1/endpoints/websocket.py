@@ -1,32 +1,219 @@
-from typing import Optional, Any
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Iterator, Literal, Optional
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
 from starlette.websockets import WebSocket
 from starlette.websockets import WebSocketDisconnect
 
-from app import crud, schemas, models
-from app.api import deps
+from app import crud, schemas
+from app.api.api_v1.broadcast import broadcast
 from app.api.api_v1.endpoints.event_cost_aggregator import (
-    event_cost_aggregator,
-    EventCostAggregatorRequest,
+    project_event_cost_aggregator_response,
     EventCostAggregatorResponse,
 )
+from app.api.api_v1.event_cost_state import event_cost_states
+from app.api.api_v1.presence import presence_buffer
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.db.session import AsyncSessionLocal
+from app.schemas.common import DetailLevel, ResponseProjection
 
+logger = logging.getLogger("uvicorn.error")
 
 EventId = int
 ParticipantId = int
+SlowConsumerPolicy = Literal["drop_oldest", "coalesce", "disconnect"]
+
+
+class WebSocketSender:
+    def __init__(
+        self: "WebSocketSender",
+        websocket: WebSocket,
+        max_queue_size: int = 16,
+        policy: SlowConsumerPolicy = "coalesce",
+    ) -> None:
+        """Outgoing message queue of a websocket, drained by a task of its own
+
+        Messages are queued without waiting for the client, so a slow client only
+        delays its own messages. With the "coalesce" policy, a new message
+        replaces the one waiting to be sent, as each message is a full update.
+        Otherwise, once `max_queue_size` messages are waiting, "drop_oldest"
+        discards the oldest waiting message and "disconnect" closes the
+        connection.
+
+        Args:
+            websocket: Accepted websocket to send messages to
+            max_queue_size: Maximum number of messages waiting to be sent
+            policy: What to do with new messages while others are waiting
+        """
+        self.websocket = websocket
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self.dropped = 0
+        self._queue: deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+
+    @property
+    def closed(self: "WebSocketSender") -> bool:
+        return self._task is None or self._task.done()
+
+    def start(self: "WebSocketSender") -> "WebSocketSender":
+        self._task = asyncio.create_task(self._drain())
+        return self
+
+    def send(self: "WebSocketSender", message: str) -> None:
+        """Queue a message, applying the slow consumer policy"""
+        if self.closed:
+            return
+
+        if self.policy == "coalesce":
+            # Only the newest full update is worth sending
+            self.dropped += len(self._queue)
+            self._queue.clear()
+        elif len(self._queue) >= self.max_queue_size:
+            if self.policy == "disconnect":
+                self._disconnect()
+                return
+
+            self.dropped += 1
+            self._queue.popleft()
+
+        self._queue.append(message)
+        self._ready.set()
+
+    def close(self: "WebSocketSender") -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+        self._queue.clear()
+
+    async def _drain(self: "WebSocketSender") -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+
+                while self._queue:
+                    await self.websocket.send_text(self._queue.popleft())
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            # The endpoint cleans up once it receives the disconnect
+            logger.debug("Websocket send failed: %r", error)
+
+    def _disconnect(self: "WebSocketSender") -> None:
+        logger.info("Disconnecting slow websocket client")
+        self.close()
+        self._close_task = asyncio.create_task(
+            self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        )
+
+
+class PendingRecalculation:
+    def __init__(self: "PendingRecalculation", requested_at: float) -> None:
+        self.first_requested_at = requested_at
+        self.last_requested_at = requested_at
+        self.requested = True
+        self.wake = asyncio.Event()
+
+
+class EventRecalculationScheduler:
+    def __init__(
+        self: "EventRecalculationScheduler",
+        recalculate: Callable[[EventId], Awaitable[None]],
+        debounce: float = 0.2,
+        max_latency: float = 1.0,
+    ) -> None:
+        """Merge bursts of recalculation requests of an event into one
+
+        A recalculation runs once no request arrived for `debounce` seconds, or
+        `max_latency` seconds after the first request it covers, whichever is
+        first. Requests arriving during a recalculation start the next round, so
+        at most one recalculation per event runs at a time.
+
+        Args:
+            recalculate: Recalculates and publishes the costs of an event
+            debounce: Seconds without requests before recalculating
+            max_latency: Maximum seconds a request waits for its recalculation
+        """
+        self.recalculate = recalculate
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self.recalculations = 0
+        self._pending: dict[EventId, PendingRecalculation] = {}
+        self._tasks: dict[EventId, asyncio.Task] = {}
+
+    def request(self: "EventRecalculationScheduler", event_id: EventId) -> None:
+        now = asyncio.get_running_loop().time()
+        pending = self._pending.get(event_id)
+
+        if pending is None:
+            pending = PendingRecalculation(now)
+            self._pending[event_id] = pending
+            # Tasks are referenced until done so they are not garbage collected
+            self._tasks[event_id] = asyncio.create_task(self._run(event_id, pending))
+        elif not pending.requested:
+            pending.first_requested_at = now
+            pending.requested = True
+
+        pending.last_requested_at = now
+        pending.wake.set()
+
+    async def _run(
+        self: "EventRecalculationScheduler",
+        event_id: EventId,
+        pending: PendingRecalculation,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+
+        try:
+            while pending.requested:
+                while True:
+                    deadline = min(
+                        pending.last_requested_at + self.debounce,
+                        pending.first_requested_at + self.max_latency,
+                    )
+                    delay = deadline - loop.time()
+
+                    if delay <= 0:
+                        break
+
+                    pending.wake.clear()
+
+                    try:
+                        await asyncio.wait_for(pending.wake.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+
+                pending.requested = False
+                self.recalculations += 1
+
+                try:
+                    await self.recalculate(event_id)
+                except Exception:
+                    logger.exception("Recalculation of event %s failed", event_id)
+        finally:
+            del self._pending[event_id]
+            del self._tasks[event_id]
 
 
 class WebSocketTable:
     def __init__(self: "WebSocketTable") -> None:
-        self._table: dict[EventId, dict[ParticipantId, WebSocket]] = {}
+        self._table: dict[EventId, dict[ParticipantId, WebSocketSender]] = {}
 
     def __call__(self: "WebSocketTable") -> "WebSocketTable":
         return self
 
     @property
-    def table(self: "WebSocketTable") -> dict[EventId, dict[ParticipantId, WebSocket]]:
+    def table(
+        self: "WebSocketTable",
+    ) -> dict[EventId, dict[ParticipantId, WebSocketSender]]:
         return self._table
 
     def get_participant_websocket(
@@ -36,12 +223,8 @@ class WebSocketTable:
     ) -> Optional[WebSocket]:
         event_id = EventId(event_id) # Seems to need explicit casting
 
-        participant_sockets = self.table.get(event_id)
-
-        if participant_sockets is not None:
-            return participant_sockets.get(participant_id)
-
-        return None
+        sender = self.table.get(event_id, {}).get(participant_id)
+        return None if sender is None else sender.websocket
 
     def add_participant_websocket(
         self: "WebSocketTable",
@@ -50,11 +233,20 @@ class WebSocketTable:
         websocket: WebSocket,
     ) -> "WebSocketTable":
         event_id = EventId(event_id) # Seems to need explicit casting
-        if event_id not in self.table:
-            self.table[event_id] = {participant_id: websocket}
+        participant_senders = self.table.setdefault(event_id, {})
+        sender = participant_senders.get(participant_id)
+
+        # A participant reconnecting replaces their previous connection
+        if sender is None or sender.websocket is not websocket:
+            if sender is not None:
+                sender.close()
 
-        elif participant_id not in self.table[event_id]:
-            self.table[event_id][participant_id] = websocket
+            sender = WebSocketSender(
+                websocket,
+                max_queue_size=settings.WEBSOCKET_SEND_QUEUE_SIZE,
+                policy=settings.WEBSOCKET_SLOW_CONSUMER_POLICY,
+            )
+            participant_senders[participant_id] = sender.start()
 
         return self
 
@@ -64,24 +256,26 @@ class WebSocketTable:
         participant_id: ParticipantId,
     ) -> Optional[WebSocket]:
         event_id = EventId(event_id) # Seems to need explicit casting
-        socket = self.table.get(event_id, {}).get(participant_id)
+        sender = self.table.get(event_id, {}).pop(participant_id, None)
 
-        if socket is not None:
-            del self.table[event_id][participant_id]
+        if sender is None:
+            return None
 
-        return socket
+        sender.close()
+        return sender.websocket
 
-    async def send_json_to_event_participant(
+    def send_to_event_participant(
         self: "WebSocketTable",
         event_id: EventId,
         participant_id: ParticipantId,
-        data: dict[str, Any],
+        message: str,
     ) -> None:
+        """Queue a message to a participant, without waiting for it to be sent"""
         event_id = EventId(event_id) # Seems to need explicit casting
+        sender = self.table.get(event_id, {}).get(participant_id)
 
-        participant_socket = self.get_participant_websocket(event_id, participant_id)
-        if participant_socket is not None:
-            await participant_socket.send_json(data)
+        if sender is not None:
+            sender.send(message)
 
     def participant_connection_closed(
         self: "WebSocketTable",
@@ -94,63 +288,104 @@ class WebSocketTable:
             websocket = self.remove_participant_websocket(event_id, participant_id)
 
 
-def _get_event(db: Session, event_id: int) -> schemas.Event:
-    db_event = crud.event.get(db=db, id=event_id)
+async def _get_event(db: AsyncSession, event_id: int) -> schemas.Event:
+    db_event = await crud.event.get_with_participants_async(db=db, id=event_id)
     event = schemas.Event.from_orm(db_event)
     return event
 
 
-def _set_participant_active(db: Session, participant_id: int, is_active: bool) -> None:
-    obj_in = {"active": is_active}
-    crud.participant.find_and_update(db=db, id=participant_id, obj_in=obj_in)
+def _encode_event_costs_messages(
+    event: schemas.Event,
+    active_participants: list[schemas.Participant],
+    costs: EventCostAggregatorResponse,
+) -> Iterator[tuple[ParticipantId, str]]:
+    """Encode the event costs message of each participant
 
+    The parts shared by all participants are encoded once, only the participant
+    is encoded per message and spliced in between them.
+    """
+    projection = ResponseProjection(detail=DetailLevel(settings.WEBSOCKET_DETAIL_LEVEL))
+    calculation = project_event_cost_aggregator_response(costs, projection)
+    prefix = b'{"event":' + dumps(event) + b',"participant":'
+    suffix = b"".join(
+        [
+            b',"event_participants_count":',
+            dumps(len(active_participants)),
+            b',"calculation":',
+            dumps(calculation),
+            b"}",
+        ]
+    )
 
-def _update_event_and_participant_tables(
-    db: Session,
-    event_id: int,
-    participant_id: int,
-) -> models.Event:
-    _set_participant_active(db, participant_id, is_active=True)
-    event = _get_event(db, event_id)
-    return event
+    for participant in active_participants:
+        message = prefix + dumps(participant) + suffix
+        yield participant.id, message.decode()
 
 
-async def _publish_event_costs(
+def _publish_event_costs(
     ws_table: WebSocketTable,
     event: schemas.Event,
     active_participants: list[schemas.Participant],
     costs: EventCostAggregatorResponse,
 ) -> None:
-    event_participants_count = len(active_participants)
+    messages = _encode_event_costs_messages(event, active_participants, costs)
 
-    for participant in active_participants:
-        data = {
-            "event": event.dict(),
-            "participant": participant.dict(),
-            "event_participants_count": event_participants_count,
-            "calculation": costs.dict(),
-        }
-        await ws_table.send_json_to_event_participant(event.id, participant.id, data)
+    for participant_id, message in messages:
+        ws_table.send_to_event_participant(event.id, participant_id, message)
 
 
 async def _recalculate_event_costs(
-    event: models.Event,
-    active_participants: list[models.Participant],
+    event: schemas.Event,
+    active_participants: list[schemas.Participant],
 ) -> EventCostAggregatorResponse:
-    request = EventCostAggregatorRequest(event=event, participants=active_participants)
-    results = await event_cost_aggregator(request)
-    return results
+    # Only participants who joined, left or moved since the last update are
+    # calculated, the totals are updated with their differences
+    state = event_cost_states.get(event)
+    updates = state.updates
+    await state.sync(active_participants)
+
+    verify_every = settings.EVENT_COST_VERIFY_EVERY
+    if verify_every and updates // verify_every != state.updates // verify_every:
+        if not await state.verify():
+            await state.reset()
+
+    return state.response()
 
 
 router = APIRouter()
 websockets_table = WebSocketTable()
 
 
+async def _recalculate_and_publish_event_costs(event_id: EventId) -> None:
+    if not websockets_table.table.get(event_id):
+        return
+
+    # A session per operation, so idle sockets do not hold pooled connections
+    async with AsyncSessionLocal() as db:
+        event = await _get_event(db, event_id)
+
+    # Presence not written to the database yet takes precedence
+    participants = presence_buffer.apply(event.participants)
+    active_participants = [p for p in participants if p.active]
+    costs = await _recalculate_event_costs(event, active_participants)
+    _publish_event_costs(websockets_table, event, active_participants, costs)
+
+
+recalculation_scheduler = EventRecalculationScheduler(
+    _recalculate_and_publish_event_costs,
+    debounce=settings.WEBSOCKET_RECALCULATION_DEBOUNCE_SECONDS,
+    max_latency=settings.WEBSOCKET_RECALCULATION_MAX_LATENCY_SECONDS,
+)
+
+# Updates published by any worker are recalculated and sent to the participants
+# connected to this worker
+broadcast.subscribe(recalculation_scheduler.request)
+
+
 @router.websocket("/")
 async def websocket_endpoint(
     websocket: WebSocket,
     ws_table: WebSocketTable = Depends(websockets_table),
-    db: Session = Depends(deps.get_db),
 ) -> None:
     """
     The websocket endpoint is listening at the root URL and is accessed via the
@@ -172,11 +407,17 @@ async def websocket_endpoint(
                 continue
 
             ws_table = ws_table.add_participant_websocket(event_id, participant_id, websocket)
-            event = _update_event_and_participant_tables(db, event_id, participant_id)
-            active_participants = [p for p in event.participants if p.active]
-            costs = await _recalculate_event_costs(event, active_participants)
-            await _publish_event_costs(ws_table, event, active_participants, costs)
+
+            # Joins are published once written, with the presence flushed with
+            # them. Repeated messages only get the current costs sent again
+            if not presence_buffer.set_active(
+                EventId(event_id), participant_id, active=True
+            ):
+                recalculation_scheduler.request(EventId(event_id))
     except WebSocketDisconnect:
         if participant_id:
             ws_table.participant_connection_closed(event_id, participant_id)
-            _set_participant_active(db, participant_id, is_active=False)
+            presence_buffer.set_active(EventId(event_id), participant_id, active=False)
+
+            if not ws_table.table.get(EventId(event_id)):
+                event_cost_states.discard(EventId(event_id))
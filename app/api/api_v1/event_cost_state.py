@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import math
+from typing import Optional
+
+from app.api.api_v1.endpoints.cost_aggregator import (
+    aggregate_cost_paths,
+    validate_request_paths,
+    CostAggregatorResponse,
+    CostPathResponse,
+)
+from app.api.api_v1.endpoints.event_cost_aggregator import (
+    build_in_person_cost_path,
+    build_online_cost_path,
+    compute_event_costs,
+    EventCostAggregatorRequest,
+    EventCostAggregatorResponse,
+)
+from app.core.geocoding import search_iso_codes
+from app.schemas import Event, Participant
+from app.schemas.common import GeoCoordinates, JoinMode
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class ParticipantCosts:
+    def __init__(
+        self: "ParticipantCosts",
+        participant: Participant,
+        in_person_path: CostPathResponse,
+    ) -> None:
+        """Costs of a participant that do not depend on the other participants"""
+        self.participant = participant
+        self.in_person_path = in_person_path
+
+    @property
+    def in_person_carbon_kg(self: "ParticipantCosts") -> float:
+        return self.in_person_path.total_carbon_kg
+
+    def matches(self: "ParticipantCosts", participant: Participant) -> bool:
+        """Whether the costs are still those of a possibly updated participant"""
+        current = self.participant
+        return (
+            current.lat == participant.lat
+            and current.lon == participant.lon
+            and current.join_mode == participant.join_mode
+        )
+
+
+class EventCostState:
+    def __init__(self: "EventCostState", event: Event) -> None:
+        """Running cost totals of an event's active participants
+
+        Each participant's in-person cost is calculated once, when they join or
+        move, and added to or subtracted from the totals. The online cost of each
+        participant depends only on the number of participants, it is calculated
+        once per participant count and shared by everyone.
+
+        Args:
+            event: Event whose participants are tracked, its venue must not change
+        """
+        self.event = event
+        self.end = GeoCoordinates(lon=event.lon, lat=event.lat)
+        self.updates = 0
+        self.lock = asyncio.Lock()
+        self._end_iso_code: Optional[str] = None
+        self._participants: dict[int, ParticipantCosts] = {}
+        self._online_path: Optional[CostPathResponse] = None
+        self._online_path_count = 0
+        self._in_person_carbon_kg = 0.0
+        self._actual_in_person_carbon_kg = 0.0
+        self._online_participants_count = 0
+
+    def __len__(self: "EventCostState") -> int:
+        return len(self._participants)
+
+    @property
+    def participants(self: "EventCostState") -> list[Participant]:
+        return [costs.participant for costs in self._participants.values()]
+
+    @property
+    def online_carbon_kg(self: "EventCostState") -> float:
+        """Online cost of a single participant at the current participant count"""
+        return 0.0 if self._online_path is None else self._online_path.total_carbon_kg
+
+    @property
+    def in_person_total_carbon_kg(self: "EventCostState") -> float:
+        return self._in_person_carbon_kg
+
+    @property
+    def online_total_carbon_kg(self: "EventCostState") -> float:
+        return len(self) * self.online_carbon_kg
+
+    @property
+    def actual_total_carbon_kg(self: "EventCostState") -> float:
+        online_carbon_kg = self._online_participants_count * self.online_carbon_kg
+        return self._actual_in_person_carbon_kg + online_carbon_kg
+
+    def matches(self: "EventCostState", event: Event) -> bool:
+        return event.lat == self.event.lat and event.lon == self.event.lon
+
+    async def sync(self: "EventCostState", participants: list[Participant]) -> None:
+        """Bring the state up to date with the event's active participants
+
+        Only participants who joined, left or changed location or join mode since
+        the last update are calculated.
+        """
+        async with self.lock:
+            active_ids = {participant.id for participant in participants}
+
+            for participant_id in list(self._participants):
+                if participant_id not in active_ids:
+                    self._remove(participant_id)
+
+            changed = [
+                participant
+                for participant in participants
+                if participant.id not in self._participants
+                or not self._participants[participant.id].matches(participant)
+            ]
+            await self._add(changed)
+            await self._update_online_path()
+
+            # Keep the order of the participants given, as a full recompute does
+            self._participants = {
+                participant.id: self._participants[participant.id]
+                for participant in participants
+            }
+
+    def response(self: "EventCostState") -> EventCostAggregatorResponse:
+        """Event costs in the format of a full recompute"""
+        online_paths = [] if self._online_path is None else [self._online_path]
+        participant_responses = [
+            CostAggregatorResponse.construct(
+                cost_paths=[costs.in_person_path, *online_paths]
+            )
+            for costs in self._participants.values()
+        ]
+        return EventCostAggregatorResponse.construct(
+            in_person_total_carbon_kg=self.in_person_total_carbon_kg,
+            online_total_carbon_kg=self.online_total_carbon_kg,
+            actual_total_carbon_kg=self.actual_total_carbon_kg,
+            participant_cost_aggregator_responses=participant_responses,
+        )
+
+    async def verify(self: "EventCostState", rel_tol: float = 1e-9) -> bool:
+        """Check the running totals against a full recompute of the event's costs
+
+        Returns: Whether all totals match within the relative tolerance
+        """
+        request = EventCostAggregatorRequest.construct(
+            event=self.event, participants=self.participants
+        )
+        expected = await compute_event_costs(request, include_participants=False)
+        totals = [
+            "in_person_total_carbon_kg",
+            "online_total_carbon_kg",
+            "actual_total_carbon_kg",
+        ]
+        mismatches = {
+            total: (getattr(self, total), getattr(expected, total))
+            for total in totals
+            if not math.isclose(
+                getattr(self, total),
+                getattr(expected, total),
+                rel_tol=rel_tol,
+                abs_tol=1e-9,
+            )
+        }
+
+        if mismatches:
+            logger.warning(
+                "Event %s running cost totals differ from full recompute: %s",
+                self.event.id,
+                mismatches,
+            )
+
+        return not mismatches
+
+    async def reset(self: "EventCostState") -> None:
+        """Recalculate every participant and the totals from scratch"""
+        participants = self.participants
+
+        async with self.lock:
+            for participant_id in list(self._participants):
+                self._remove(participant_id)
+
+            # Clear rounding errors accumulated by the deltas
+            self._in_person_carbon_kg = 0.0
+            self._actual_in_person_carbon_kg = 0.0
+
+        await self.sync(participants)
+
+    def _apply(self: "EventCostState", costs: ParticipantCosts, sign: int) -> None:
+        carbon_kg = sign * costs.in_person_carbon_kg
+        self._in_person_carbon_kg += carbon_kg
+        join_mode = costs.participant.join_mode
+
+        if join_mode == JoinMode.in_person:
+            self._actual_in_person_carbon_kg += carbon_kg
+        elif join_mode == JoinMode.online:
+            self._online_participants_count += sign
+
+        self.updates += 1
+
+    def _remove(self: "EventCostState", participant_id: int) -> None:
+        costs = self._participants.pop(participant_id)
+        self._apply(costs, -1)
+
+    async def _add(self: "EventCostState", participants: list[Participant]) -> None:
+        if not participants:
+            return
+
+        starts = [GeoCoordinates(lon=p.lon, lat=p.lat) for p in participants]
+
+        if self._end_iso_code is None:
+            self._end_iso_code, *start_iso_codes = search_iso_codes([self.end, *starts])
+        else:
+            start_iso_codes = search_iso_codes(starts)
+
+        end, end_iso_code = self.end, self._end_iso_code
+        cost_paths = [
+            validate_request_paths(
+                [build_in_person_cost_path(start, end, iso_code, end_iso_code)]
+            )
+            for start, iso_code in zip(starts, start_iso_codes)
+        ]
+        responses = await aggregate_cost_paths(cost_paths)
+
+        for participant, response in zip(participants, responses):
+            if participant.id in self._participants:
+                self._remove(participant.id)
+
+            costs = ParticipantCosts(participant, response.cost_paths[0])
+            self._participants[participant.id] = costs
+            self._apply(costs, 1)
+
+    async def _update_online_path(self: "EventCostState") -> None:
+        count = len(self)
+
+        if count == self._online_path_count:
+            return
+
+        if count == 0:
+            self._online_path = None
+        else:
+            online_path = build_online_cost_path(count)
+            (response,) = await aggregate_cost_paths(
+                [validate_request_paths([online_path])]
+            )
+            self._online_path = response.cost_paths[0]
+
+        self._online_path_count = count
+
+
+class EventCostStates:
+    def __init__(self: "EventCostStates") -> None:
+        """Running cost states of the events with connected participants"""
+        self._states: dict[int, EventCostState] = {}
+
+    def get(self: "EventCostStates", event: Event) -> EventCostState:
+        """Get the state of an event, starting over if its venue moved"""
+        state = self._states.get(event.id)
+
+        if state is None or not state.matches(event):
+            state = EventCostState(event)
+            self._states[event.id] = state
+
+        return state
+
+    def discard(self: "EventCostStates", event_id: int) -> None:
+        self._states.pop(event_id, None)
+
+
+event_cost_states = EventCostStates()
@@ -0,0 +1,165 @@
+import asyncio
+import contextlib
+import logging
+from typing import Awaitable, Callable, Optional
+
+from app import crud
+from app.api.api_v1.broadcast import broadcast
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.schemas import Participant
+
+logger = logging.getLogger("uvicorn.error")
+
+EventId = int
+ParticipantId = int
+
+
+class Presence:
+    def __init__(
+        self: "Presence",
+        event_id: EventId,
+        active: bool,
+    ) -> None:
+        """Whether a participant is connected, and whether it was written yet"""
+        self.event_id = event_id
+        self.active = active
+        self.flushed = False
+
+
+class PresenceBuffer:
+    def __init__(
+        self: "PresenceBuffer",
+        publish: Callable[[EventId], Awaitable[None]],
+        flush_interval: float = 0.25,
+    ) -> None:
+        """Participant presence of live events, written behind to the database
+
+        Connections and disconnections only update the buffer. Every
+        `flush_interval` seconds, the changed `active` flags are written in
+        batched updates and the events involved are published, so their costs
+        are recalculated from the updated participants. Until then, the buffer
+        takes precedence over the flags loaded from the database.
+
+        Args:
+            publish: Notifies that the participants of an event changed
+            flush_interval: Seconds between writes of changed flags
+        """
+        self.publish = publish
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self._presence: dict[ParticipantId, Presence] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self: "PresenceBuffer") -> int:
+        """Number of changed flags not written yet"""
+        return sum(not presence.flushed for presence in self._presence.values())
+
+    def set_active(
+        self: "PresenceBuffer",
+        event_id: EventId,
+        participant_id: ParticipantId,
+        active: bool,
+    ) -> bool:
+        """Record a participant's presence
+
+        Returns: Whether the presence changed and will be written
+        """
+        presence = self._presence.get(participant_id)
+
+        if (
+            presence is not None
+            and presence.event_id == event_id
+            and presence.active == active
+        ):
+            return False
+
+        self._presence[participant_id] = Presence(event_id, active)
+        return True
+
+    def apply(
+        self: "PresenceBuffer", participants: list[Participant]
+    ) -> list[Participant]:
+        """Participants with the presence recorded here in place of their flags"""
+        applied = []
+
+        for participant in participants:
+            presence = self._presence.get(participant.id)
+
+            if presence is not None and presence.active != participant.active:
+                participant = participant.copy(update={"active": presence.active})
+
+            applied.append(participant)
+
+        return applied
+
+    def start(self: "PresenceBuffer") -> None:
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self: "PresenceBuffer") -> None:
+        """Stop flushing periodically, then write what is left"""
+        task, self._task = self._task, None
+
+        if task is not None:
+            task.cancel()
+
+            # A flush in progress is rolled back, the final flush writes it again
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        await self.flush()
+
+    async def flush(self: "PresenceBuffer") -> None:
+        """Write changed flags, then publish the events whose participants changed"""
+        async with self._lock:
+            changed = {
+                participant_id: presence
+                for participant_id, presence in self._presence.items()
+                if not presence.flushed
+            }
+
+            if not changed:
+                return
+
+            active = {
+                participant_id: presence.active
+                for participant_id, presence in changed.items()
+            }
+
+            async with AsyncSessionLocal() as db:
+                event_ids = await crud.participant.set_active_async(db, active=active)
+
+            for participant_id, presence in changed.items():
+                presence.flushed = True
+
+                # Disconnected participants are in the database from now on,
+                # unless they reconnected while writing
+                if (
+                    not presence.active
+                    and self._presence.get(participant_id) is presence
+                ):
+                    del self._presence[participant_id]
+
+            self.flushes += 1
+
+        for event_id in event_ids:
+            await self.publish(event_id)
+
+    async def _flush_periodically(self: "PresenceBuffer") -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Changes stay in the buffer and are written by the next flush
+                logger.exception("Writing participant presence failed")
+
+
+presence_buffer = PresenceBuffer(
+    broadcast.publish, flush_interval=settings.PRESENCE_FLUSH_INTERVAL_SECONDS
+)
@@ -0,0 +1,255 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Optional, TYPE_CHECKING
+
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.api.api_v1.calculator_interface import CalculatorInterface  # noqa
+
+
+class MemoryResultStore:
+    # Lookups are cheap enough to run on the event loop
+    blocking = False
+
+    def __init__(
+        self: "MemoryResultStore",
+        maxsize: int,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Per-process result store keeping response objects in an LRU cache"""
+        self._cache: LRUCache[str, Any] = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def __len__(self: "MemoryResultStore") -> int:
+        return len(self._cache)
+
+    def get_many(self: "MemoryResultStore", keys: list[str]) -> list[Optional[Any]]:
+        return [self._cache.get(key) for key in keys]
+
+    def set_many(self: "MemoryResultStore", items: dict[str, Any]) -> None:
+        for key, value in items.items():
+            self._cache.set(key, value)
+
+    def clear(self: "MemoryResultStore") -> None:
+        self._cache.clear()
+
+
+class SQLiteResultStore:
+    # Queries may wait for other workers' writes, they run in the threadpool
+    blocking = True
+
+    def __init__(
+        self: "SQLiteResultStore",
+        path: str,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        evict_every: int = 100,
+        touch_after: Optional[float] = None,
+    ) -> None:
+        """Result store in a local SQLite file, shared by all workers on a host
+
+        Responses are pickled, the file must only be writable by the API itself.
+        Least recently used entries beyond `maxsize` are evicted every
+        `evict_every` writes. Reads only record an entry's access time once it is
+        older than `touch_after`, so most cache hits do not write.
+
+        Args:
+            path: Location of SQLite database file
+            maxsize: Maximum number of entries kept
+            ttl: Seconds after which entries expire, entries never expire if None
+            evict_every: Number of writes between evictions
+            touch_after: Seconds before a read records its access time again,
+                defaults to a tenth of the TTL, or a minute without TTL
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evict_every = evict_every
+
+        if touch_after is None:
+            touch_after = 60.0 if ttl is None else ttl / 10
+
+        self.touch_after = touch_after
+        self._writes = 0
+        self._local = threading.local()
+
+    def __len__(self: "SQLiteResultStore") -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    @property
+    def _connection(self: "SQLiteResultStore") -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL"
+                ")"
+            )
+            self._local.connection = connection
+
+        return connection
+
+    def get_many(self: "SQLiteResultStore", keys: list[str]) -> list[Optional[Any]]:
+        now = time.time()
+        distinct_keys = list(set(keys))
+        rows = []
+
+        # Stay below SQLite's limit on the number of query parameters
+        for start in range(0, len(distinct_keys), 500):
+            chunk = distinct_keys[start : start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            rows += self._connection.execute(
+                "SELECT key, value, accessed_at FROM results"
+                f" WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*chunk, now),
+            ).fetchall()
+
+        stale = [
+            (now, key)
+            for key, _, accessed_at in rows
+            if accessed_at < now - self.touch_after
+        ]
+
+        if stale:
+            self._connection.executemany(
+                "UPDATE results SET accessed_at = ? WHERE key = ?", stale
+            )
+
+        values = {key: pickle.loads(value) for key, value, _ in rows}
+        return [values.get(key) for key in keys]
+
+    def set_many(self: "SQLiteResultStore", items: dict[str, Any]) -> None:
+        now = time.time()
+        expires_at = float("inf") if self.ttl is None else now + self.ttl
+        rows = [
+            (key, pickle.dumps(value), expires_at, now) for key, value in items.items()
+        ]
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows
+            )
+
+        writes = self._writes
+        self._writes += len(rows)
+
+        if writes // self.evict_every != self._writes // self.evict_every:
+            self._evict(now)
+
+    def clear(self: "SQLiteResultStore") -> None:
+        self._connection.execute("DELETE FROM results")
+
+    def _evict(self: "SQLiteResultStore", now: float) -> None:
+        self._connection.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+        self._connection.execute(
+            "DELETE FROM results WHERE key IN ("
+            " SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?"
+            ")",
+            (self.maxsize,),
+        )
+
+
+class CalculatorResultCache:
+    def __init__(self: "CalculatorResultCache", store: Any) -> None:
+        """Content-addressed cache of calculator responses
+
+        Responses are keyed on the calculator name and a hash of the canonical
+        JSON of the validated request, so identical requests share an entry
+        whatever their key order or formatting.
+
+        Args:
+            store: Backend store, `MemoryResultStore` or `SQLiteResultStore`
+        """
+        self.store = store
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+    @staticmethod
+    def key(calculator: "CalculatorInterface", request: BaseModel) -> str:
+        content = request.json(sort_keys=True).encode()
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{calculator.name}:{digest}"
+
+    async def get_many(
+        self: "CalculatorResultCache",
+        calculator: "CalculatorInterface",
+        keys: list[str],
+    ) -> list[Optional[Any]]:
+        """Cached responses of keys, None for those missing"""
+        if self.store.blocking:
+            responses = await run_in_threadpool(self.store.get_many, keys)
+        else:
+            responses = self.store.get_many(keys)
+
+        hits = sum(response is not None for response in responses)
+        self.hits[calculator.name] += hits
+        self.misses[calculator.name] += len(responses) - hits
+        return responses
+
+    async def set_many(
+        self: "CalculatorResultCache", responses: dict[str, Any]
+    ) -> None:
+        if self.store.blocking:
+            await run_in_threadpool(self.store.set_many, responses)
+        else:
+            self.store.set_many(responses)
+
+    def clear(self: "CalculatorResultCache") -> None:
+        self.store.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def stats(self: "CalculatorResultCache") -> dict[str, Any]:
+        names = sorted(set(self.hits) | set(self.misses))
+        calculators = {
+            name: _hit_rate(self.hits[name], self.misses[name]) for name in names
+        }
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "backend": type(self.store).__name__,
+            "size": len(self.store),
+            **_hit_rate(hits, misses),
+            "calculators": calculators,
+        }
+
+
+def _hit_rate(hits: int, misses: int) -> dict[str, Any]:
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
+
+
+def build_result_cache() -> Optional[CalculatorResultCache]:
+    """Build the result cache configured in settings, None if disabled"""
+    backend = settings.RESULT_CACHE_BACKEND
+    maxsize = settings.RESULT_CACHE_SIZE
+    ttl = settings.RESULT_CACHE_TTL_SECONDS
+
+    if backend == "memory":
+        return CalculatorResultCache(MemoryResultStore(maxsize=maxsize, ttl=ttl))
+
+    if backend == "sqlite":
+        path = settings.RESULT_CACHE_PATH
+        return CalculatorResultCache(SQLiteResultStore(path, maxsize=maxsize, ttl=ttl))
+
+    return None
+
+
+result_cache = build_result_cache()
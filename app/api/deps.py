@@ -1,6 +1,9 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 
-from app.db.session import SessionLocal
+from fastapi import Query
+
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.schemas.common import DetailLevel, ResponseProjection
 
 
 def get_db() -> Generator:
@@ -12,3 +15,16 @@ def get_db() -> Generator:
     finally:
         if db is not None:
             db.close()
+
+
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_response_projection(
+    detail: DetailLevel = DetailLevel.full,
+    include: Optional[list[str]] = Query(None),
+    exclude: Optional[list[str]] = Query(None),
+) -> ResponseProjection:
+    return ResponseProjection(detail=detail, include=include, exclude=exclude)
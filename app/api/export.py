@@ -0,0 +1,46 @@
+from typing import Any, Iterator, Type
+
+from pydantic import BaseModel
+from starlette.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.crud.base import CRUDBase
+from app.db.session import SessionLocal
+
+
+def iter_ndjson_export(
+    crud: CRUDBase[Any, Any, Any],
+    schema: Type[BaseModel],
+    batch_size: int,
+) -> Iterator[bytes]:
+    """Encode every object of a table as NDJSON, `batch_size` lines at a time
+
+    The session is opened here rather than by a dependency, so it stays open for
+    as long as the response streams.
+    """
+    db = SessionLocal()
+
+    try:
+        lines = []
+
+        for obj in crud.stream(db, batch_size=batch_size):
+            lines.append(dumps(schema.from_orm(obj)))
+
+            if len(lines) == batch_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    finally:
+        db.close()
+
+
+def ndjson_export_response(
+    crud: CRUDBase[Any, Any, Any],
+    schema: Type[BaseModel],
+) -> StreamingResponse:
+    """Response streaming every object of a table as NDJSON, one object per line"""
+    lines = iter_ndjson_export(crud, schema, settings.EXPORT_BATCH_SIZE)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+KeyT = TypeVar("KeyT", bound=Hashable)
+ValueT = TypeVar("ValueT")
+
+
+class LRUCache(Generic[KeyT, ValueT]):
+    def __init__(self: "LRUCache", maxsize: int, ttl: Optional[float] = None) -> None:
+        """Thread-safe, size-bounded least recently used cache with hit counters
+
+        Args:
+            maxsize: Maximum number of entries kept, a size of 0 disables the cache
+            ttl: Seconds after which entries expire, entries never expire if None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[KeyT, tuple[ValueT, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self: "LRUCache") -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self: "LRUCache") -> bool:
+        return self.maxsize > 0
+
+    def get(self: "LRUCache", key: KeyT) -> Optional[ValueT]:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self: "LRUCache", key: KeyT, value: ValueT) -> None:
+        if not self.enabled:
+            return
+
+        expires_at = float("inf") if self.ttl is None else time.monotonic() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self: "LRUCache") -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self: "LRUCache") -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
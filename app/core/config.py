@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import AnyHttpUrl, BaseSettings, PostgresDsn, validator
 
@@ -54,6 +54,121 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # Connection pool of each engine, per worker. Checkouts wait up to
+    # DB_POOL_TIMEOUT seconds for a connection once DB_POOL_SIZE + DB_MAX_OVERFLOW
+    # are in use, and connections are replaced after DB_POOL_RECYCLE seconds, -1
+    # keeps them open
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+
+    # Async sessions connect through asyncpg, to the same database by default
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None
+
+    @validator("SQLALCHEMY_ASYNC_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(
+        cls, v: Optional[str], values: Dict[str, Any]
+    ) -> Any:
+        if isinstance(v, str):
+            return v
+
+        sync_uri = values.get("SQLALCHEMY_DATABASE_URI")
+
+        # An invalid sync URI is already reported by its own validator
+        if sync_uri is None:
+            return None
+
+        scheme, _, rest = str(sync_uri).partition("://")
+
+        if scheme.split("+")[0] in ("postgres", "postgresql"):
+            scheme = "postgresql+asyncpg"
+
+        return f"{scheme}://{rest}"
+
+    # Preload heavy data at startup. With WARMUP_IN_BACKGROUND the server accepts
+    # requests while warming up and reports progress on /ready
+    WARMUP_ON_STARTUP: bool = True
+    WARMUP_IN_BACKGROUND: bool = False
+
+    # Compact reverse geocoder index, memory-mapped by every worker. Built from the
+    # reverse_geocoder dataset if missing, or ahead of time with
+    # `python -m app.core.geocoding`
+    GEOCODER_INDEX_PATH: str = "data/geocoder_index.bin"
+
+    # Flight stage distances are cached on coordinates rounded to
+    # FLIGHT_DISTANCE_CACHE_PRECISION decimal places, a size of 0 disables the cache
+    FLIGHT_DISTANCE_CACHE_SIZE: int = 4096
+    FLIGHT_DISTANCE_CACHE_PRECISION: int = 4
+
+    # Calculators marked as CPU-bound run in a "thread" or "process" pool, and at
+    # most CALCULATOR_CONCURRENCY calculations run at once
+    CALCULATOR_POOL: Literal["thread", "process"] = "thread"
+    CALCULATOR_POOL_WORKERS: Optional[int] = None
+    CALCULATOR_CONCURRENCY: int = 64
+
+    # Calculator responses are cached on calculator name and request content, per
+    # process with "memory", shared by all workers on a host with "sqlite", or not
+    # at all with "none"
+    RESULT_CACHE_BACKEND: Literal["none", "memory", "sqlite"] = "memory"
+    RESULT_CACHE_SIZE: int = 10000
+    RESULT_CACHE_TTL_SECONDS: Optional[float] = 3600
+    RESULT_CACHE_PATH: str = "data/result_cache.sqlite3"
+
+    # Bulk cost aggregation processes NDJSON lines in chunks of this size
+    COST_AGGREGATOR_BULK_CHUNK_SIZE: int = 100
+    COST_AGGREGATOR_BULK_MAX_LINE_BYTES: int = 1024 * 1024
+
+    # NDJSON exports of CRUD tables read and send this many rows at a time
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Calculator schema documents may be reused by clients for this many seconds
+    # before revalidating them with their ETag
+    CALCULATOR_SCHEMAS_MAX_AGE: int = 300
+
+    # Event cost totals are kept up to date incrementally as participants join and
+    # leave, and checked against a full recompute every EVENT_COST_VERIFY_EVERY
+    # updates, 0 disables the check
+    EVENT_COST_VERIFY_EVERY: int = 100
+
+    # Events with at least EVENT_SHARD_THRESHOLD participants are calculated in
+    # shards of EVENT_SHARD_SIZE participants across a pool of EVENT_SHARD_WORKERS
+    # processes, a threshold of 0 disables sharding
+    EVENT_SHARD_THRESHOLD: int = 2000
+    EVENT_SHARD_SIZE: int = 1000
+    EVENT_SHARD_WORKERS: Optional[int] = None
+
+    # Event cost responses of stored events are cached per event version
+    EVENT_COST_CACHE_SIZE: int = 256
+
+    # Detail level of event costs pushed to websocket clients
+    WEBSOCKET_DETAIL_LEVEL: Literal["totals", "paths", "full"] = "full"
+
+    # Messages to each websocket client are queued and sent by a task of its own.
+    # With "coalesce", a new message replaces the one waiting to be sent. Once
+    # WEBSOCKET_SEND_QUEUE_SIZE messages are waiting for a slow client, the oldest
+    # is dropped with "drop_oldest", or the client is disconnected with
+    # "disconnect"
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 16
+    WEBSOCKET_SLOW_CONSUMER_POLICY: Literal[
+        "drop_oldest", "coalesce", "disconnect"
+    ] = "coalesce"
+
+    # Event updates reach websocket clients of this worker only with "memory", or
+    # of all workers through Postgres LISTEN/NOTIFY on BROADCAST_CHANNEL with
+    # "postgres"
+    BROADCAST_BACKEND: Literal["memory", "postgres"] = "memory"
+    BROADCAST_CHANNEL: str = "event_updates"
+
+    # Websocket participant presence is written to the database in batches every
+    # PRESENCE_FLUSH_INTERVAL_SECONDS, and once more on shutdown
+    PRESENCE_FLUSH_INTERVAL_SECONDS: float = 0.25
+
+    # Joins and leaves of an event are merged into one recalculation once none
+    # arrived for the debounce window, or at the latest after the max latency
+    WEBSOCKET_RECALCULATION_DEBOUNCE_SECONDS: float = 0.2
+    WEBSOCKET_RECALCULATION_MAX_LATENCY_SECONDS: float = 1.0
+
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,164 @@
+import csv
+import os
+import struct
+import threading
+from typing import Optional, Sequence, Type
+
+import numpy as np
+import reverse_geocoder
+from scipy.spatial import cKDTree
+
+from app.core.config import settings
+from app.schemas.common import GeoCoordinates
+
+# Index file layout: header, then a (n, 2) little-endian float64 array of
+# latitude/longitude pairs, then n two-byte ISO country codes
+INDEX_MAGIC = b"RGIDX001"
+INDEX_HEADER = struct.Struct("<8sQ")
+
+
+class GeocoderIndex:
+    def __init__(
+        self: "GeocoderIndex",
+        coordinates: np.ndarray,
+        iso_codes: np.ndarray,
+    ) -> None:
+        """Nearest-city lookup of ISO country codes
+
+        The KD-tree references the coordinate array without copying it, so an
+        index loaded with `load` shares the city table with every other worker
+        through the page cache.
+
+        Args:
+            coordinates: (n, 2) float64 array of city latitude/longitude pairs
+            iso_codes: n two-byte ISO country codes of the cities
+        """
+        self.coordinates = coordinates
+        self.iso_codes = iso_codes
+        self.tree = cKDTree(coordinates, copy_data=False)
+
+    def __len__(self: "GeocoderIndex") -> int:
+        return len(self.iso_codes)
+
+    @classmethod
+    def load(cls: Type["GeocoderIndex"], path: str) -> "GeocoderIndex":
+        """Memory-map an index file written by `build_geocoder_index`"""
+        with open(path, "rb") as file:
+            magic, count = INDEX_HEADER.unpack(file.read(INDEX_HEADER.size))
+
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Not a geocoder index file: {path}")
+
+        coordinates_offset = INDEX_HEADER.size
+        iso_codes_offset = coordinates_offset + count * 2 * 8
+        coordinates = np.memmap(
+            path, dtype="<f8", mode="r", offset=coordinates_offset, shape=(count, 2)
+        )
+        iso_codes = np.memmap(
+            path, dtype="S2", mode="r", offset=iso_codes_offset, shape=(count,)
+        )
+        return cls(coordinates, iso_codes)
+
+    def query(self: "GeocoderIndex", lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Find the ISO country code of the nearest city to each location
+
+        Args:
+            lats: Latitudes of locations
+            lons: Longitudes of locations
+
+        Returns: Array of ISO 3166 alpha-2 country codes, in input order
+        """
+        points = np.column_stack([lats, lons]).astype(np.float64)
+        _, indices = self.tree.query(points, k=1)
+        return self.iso_codes[indices].astype("U2")
+
+
+def build_geocoder_index(path: str) -> None:
+    """Write the reverse_geocoder city dataset as a compact, mmap-able index file
+
+    The file is written to a temporary path and moved into place, so workers
+    building the index concurrently never read a partial file.
+
+    Args:
+        path: Location of index file to write
+    """
+    package_dir = os.path.dirname(reverse_geocoder.__file__)
+    source = os.path.join(package_dir, reverse_geocoder.RG_FILE)
+
+    with open(source, newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+
+    coordinates = np.array(
+        [(float(row["lat"]), float(row["lon"])) for row in rows], dtype="<f8"
+    )
+    iso_codes = np.array([row["cc"] for row in rows], dtype="S2")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(temporary_path, "wb") as file:
+        file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(rows)))
+        file.write(coordinates.tobytes())
+        file.write(iso_codes.tobytes())
+
+    os.replace(temporary_path, path)
+
+
+_geocoder_index: Optional[GeocoderIndex] = None
+_geocoder_index_lock = threading.Lock()
+
+
+def get_geocoder_index() -> GeocoderIndex:
+    """Get the shared geocoder index, building the index file if missing"""
+    global _geocoder_index
+
+    with _geocoder_index_lock:
+        if _geocoder_index is None:
+            path = settings.GEOCODER_INDEX_PATH
+
+            if not os.path.exists(path):
+                build_geocoder_index(path)
+
+            _geocoder_index = GeocoderIndex.load(path)
+
+    return _geocoder_index
+
+
+def search_iso_codes_array(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Find the ISO country codes of many locations given as coordinate arrays
+
+    Args:
+        lats: Latitudes of locations
+        lons: Longitudes of locations
+
+    Returns: Array of ISO 3166 alpha-2 country codes, in input order
+    """
+    if len(lats) == 0:
+        return np.zeros(0, dtype="U2")
+
+    return get_geocoder_index().query(lats, lons)
+
+
+def search_iso_codes(coordinates: Sequence[GeoCoordinates]) -> list[str]:
+    """Find the ISO country code of the nearest city to each location
+
+    All locations are resolved with a single KD-tree query against the shared
+    geocoder index.
+
+    Args:
+        coordinates: Locations to reverse geocode
+
+    Returns: ISO 3166 alpha-2 country code of each location, in input order
+    """
+    lats = np.array([c.lat for c in coordinates], dtype=np.float64)
+    lons = np.array([c.lon for c in coordinates], dtype=np.float64)
+    return search_iso_codes_array(lats, lons).tolist()
+
+
+def load_geocoder() -> None:
+    """Load the geocoder index and build its KD-tree ahead of first use"""
+    get_geocoder_index()
+
+
+if __name__ == "__main__":
+    build_geocoder_index(settings.GEOCODER_INDEX_PATH)
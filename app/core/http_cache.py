@@ -0,0 +1,65 @@
+import hashlib
+from typing import Any, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.serialization import dumps
+
+
+def make_etag(body: bytes) -> str:
+    """Strong entity tag of a response body"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches an entity tag
+
+    As required for If-None-Match, tags are compared weakly, ignoring `W/`.
+    """
+    if_none_match = request.headers.get("if-none-match")
+
+    if if_none_match is None:
+        return False
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag.replace("W/", "", 1) for tag in tags)
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    cache_control: str,
+    media_type: str = "application/json",
+) -> Response:
+    """Response with caching headers, or 304 if the client's copy is current"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type=media_type, headers=headers)
+
+
+class CachedDocument:
+    def __init__(
+        self: "CachedDocument",
+        content: Any,
+        max_age: Optional[int] = None,
+    ) -> None:
+        """JSON document encoded once and served with a strong ETag
+
+        Args:
+            content: Document content, encoded immediately
+            max_age: Seconds clients may reuse the document without revalidating,
+                clients always revalidate if None
+        """
+        self.body = dumps(content)
+        self.etag = make_etag(self.body)
+        self.cache_control = (
+            "no-cache" if max_age is None else f"public, max-age={max_age}"
+        )
+
+    def response(self: "CachedDocument", request: Request) -> Response:
+        return cached_response(request, self.body, self.etag, self.cache_control)
@@ -0,0 +1,51 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+dumps_options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        # Shallow, nested models are passed back to the encoder one at a time
+        fields = obj.__fields__
+        values = obj.__dict__
+
+        if "__root__" in values:
+            return values["__root__"]
+
+        return {
+            fields[name].alias if name in fields else name: value
+            for name, value in values.items()
+        }
+
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    if isinstance(obj, Decimal):
+        return float(obj)
+
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content to JSON bytes, including pydantic models, without copying
+
+    Models are encoded by field alias, as `jsonable_encoder` does. Enums, dates,
+    UUIDs, numpy values and floats are formatted by orjson itself.
+    """
+    return orjson.dumps(content, default=_default, option=dumps_options)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoding its content, pydantic models included, with orjson
+
+    Endpoints returning an instance directly skip FastAPI's `jsonable_encoder`
+    pass over the response.
+    """
+
+    def render(self: "ORJSONResponse", content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# uvicorn only configures its own loggers, log through them so the startup
+# breakdown shows up next to the server startup messages
+logger = logging.getLogger("uvicorn.error")
+
+
+class Warmup:
+    def __init__(self: "Warmup") -> None:
+        """Ordered set of expensive initialization steps run once at startup
+
+        Steps preload data and caches that would otherwise be built lazily by the
+        first requests after a deploy or restart.
+        """
+        self._steps: dict[str, Callable[[], Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.current_step: Optional[str] = None
+        self.timings: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.skipped = False
+
+    @property
+    def ready(self: "Warmup") -> bool:
+        return self.finished_at is not None
+
+    @property
+    def duration(self: "Warmup") -> Optional[float]:
+        if self.started_at is None:
+            return None
+
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def add_step(self: "Warmup", name: str, step: Callable[[], Any]) -> "Warmup":
+        self._steps[name] = step
+        return self
+
+    async def run(self: "Warmup") -> None:
+        """Run all steps in order, off the event loop
+
+        A failing step is logged and reported but does not prevent readiness, the
+        affected resource is then loaded lazily by the first request using it.
+        """
+        self.started_at = time.perf_counter()
+
+        for name, step in self._steps.items():
+            self.current_step = name
+            step_started_at = time.perf_counter()
+
+            try:
+                await run_in_threadpool(step)
+            except Exception as error:
+                logger.exception("Warm-up step %s failed", name)
+                self.errors[name] = repr(error)
+
+            self.timings[name] = time.perf_counter() - step_started_at
+
+        self.current_step = None
+        self.finished_at = time.perf_counter()
+        self._log_timings()
+
+    def skip(self: "Warmup") -> None:
+        """Mark warm-up as finished without running any step
+
+        Resources are then loaded lazily by the first requests using them.
+        """
+        self.started_at = self.finished_at = time.perf_counter()
+        self.skipped = True
+        logger.info("Warm-up skipped")
+
+    def start(self: "Warmup") -> None:
+        """Run all steps in a background task"""
+        self._task = asyncio.get_event_loop().create_task(self.run())
+
+    def status(self: "Warmup") -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "skipped": self.skipped,
+            "current_step": self.current_step,
+            "completed_steps": len(self.timings),
+            "total_steps": len(self._steps),
+            "duration_seconds": self.duration,
+            "timings_seconds": self.timings,
+            "errors": self.errors,
+        }
+
+    def _log_timings(self: "Warmup") -> None:
+        breakdown = ", ".join(f"{n}={t:.3f}s" for n, t in self.timings.items())
+        logger.info("Warm-up finished in %.3fs (%s)", self.duration, breakdown)
+
+
+warmup = Warmup()
@@ -1,9 +1,25 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import binascii
+import json
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
 
 from app.db.base_class import Base
 
@@ -12,6 +28,23 @@ CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
+def encode_cursor(id: int) -> str:
+    """Opaque cursor pointing after the object with the given ID"""
+    return base64.urlsafe_b64encode(json.dumps({"id": id}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        id = json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return id
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]) -> None:
         """CRUD object with default methods to Create, Read, Update, Delete (CRUD)
@@ -31,7 +64,34 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        return self._list_query(db).offset(skip).limit(limit).all()
+
+    def get_page(
+        self, db: Session, *, cursor: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """Get the objects following a cursor, in order of ID
+
+        Pages are read from the ID index, so each page reads as fast as the first,
+        unlike with offsets.
+
+        Returns: Objects of the page and the cursor of the next page, None if the
+            page is the last
+        """
+        return self._page(self._list_query(db), cursor=cursor, limit=limit)
+
+    def stream(self, db: Session, *, batch_size: int = 1000) -> Iterator[ModelType]:
+        """Iterate over all objects, in order of ID, through a server-side cursor
+
+        Rows are fetched `batch_size` at a time as the iteration goes, and objects
+        no longer referenced are released, so memory use stays constant.
+        """
+        query = (
+            self._list_query(db)
+            .order_by(self.model.id)
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+        return iter(query)
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
@@ -48,16 +108,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]],
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
-
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-
+        self._apply_update(db_obj, obj_in)
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
@@ -85,6 +136,104 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj = self.remove(db=db, id=id)
         return db_obj
 
+    # Async counterparts of the methods above, for use with an `AsyncSession`
+
+    async def get_async(self, db: AsyncSession, id: Any) -> ModelType:
+        result = await db.scalar(select(self.model).filter(self.model.id == id))
+        result = self._raise_if_unfound(result)
+        return result
+
+    async def get_multi_async(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100
+    ) -> List[ModelType]:
+        result = await db.scalars(select(self.model).offset(skip).limit(limit))
+        return result.all()
+
+    async def create_async(
+        self, db: AsyncSession, *, obj_in: CreateSchemaType
+    ) -> ModelType:
+        obj_in_data = jsonable_encoder(obj_in)
+        db_obj = self.model(**obj_in_data)  # type: ignore
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def update_async(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> ModelType:
+        self._apply_update(db_obj, obj_in)
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def remove_async(self, db: AsyncSession, *, id: int) -> ModelType:
+        obj = await db.get(self.model, id)
+        await db.delete(obj)
+        await db.commit()
+        return obj
+
+    async def find_and_update_async(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> ModelType:
+        db_obj = await self.get_async(db=db, id=id)
+        db_obj = await self.update_async(db=db, db_obj=db_obj, obj_in=obj_in)
+        return db_obj
+
+    async def find_and_remove_async(self, *, db: AsyncSession, id: int) -> ModelType:
+        await self.get_async(db=db, id=id)
+        db_obj = await self.remove_async(db=db, id=id)
+        return db_obj
+
+    def _list_query(self, db: Session) -> Query:
+        """Query of the objects read by the list methods"""
+        return db.query(self.model)
+
+    def _page(
+        self, query: Query, *, cursor: Optional[str], limit: int
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        query = query.order_by(self.model.id)
+
+        if cursor is not None:
+            query = query.filter(self.model.id > decode_cursor(cursor))
+
+        results = query.limit(limit + 1).all()
+
+        if len(results) <= limit:
+            return results, None
+
+        results = results[:limit]
+        return results, encode_cursor(results[-1].id)
+
+    def _update_data(
+        self, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        if isinstance(obj_in, dict):
+            return obj_in
+
+        return obj_in.dict(exclude_unset=True)
+
+    def _apply_update(
+        self,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> None:
+        obj_data = jsonable_encoder(db_obj)
+        update_data = self._update_data(obj_in)
+
+        for field in obj_data:
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+
     def _raise_if_unfound(self, obj: Optional[ModelType]) -> ModelType:
         if obj is None:
             raise HTTPException(status_code=404, detail=f"{self.classname} not found")
@@ -1,10 +1,115 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
+
 from app.crud.base import CRUDBase
 from app.models.event import Event
+from app.models.participant import Participant
+from app.schemas.common import ParticipantsMode
 from app.schemas.event import EventCreate, EventUpdate
 
 
 class CRUDEvent(CRUDBase[Event, EventCreate, EventUpdate]):
-    pass
+    def get_with_participants(self, db: Session, id: Any) -> Event:
+        """Get event and its participants in a single query"""
+        result = (
+            db.query(self.model)
+            .options(joinedload(self.model.participants))
+            .filter(self.model.id == id)
+            .first()
+        )
+        result = self._raise_if_unfound(result)
+        return result
+
+    def get_multi(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        participants: ParticipantsMode = ParticipantsMode.full,
+    ) -> List[Event]:
+        query = self._list_query(db, participants=participants)
+        return query.offset(skip).limit(limit).all()
+
+    def get_page(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        participants: ParticipantsMode = ParticipantsMode.full,
+    ) -> Tuple[List[Event], Optional[str]]:
+        query = self._list_query(db, participants=participants)
+        return self._page(query, cursor=cursor, limit=limit)
+
+    def get_participant_counts(self, db: Session, ids: Iterable[Any]) -> Dict[int, int]:
+        """Count the participants of several events in a single query
+
+        Events without participants are left out.
+        """
+        results = (
+            db.query(Participant.event_id, func.count(Participant.id))
+            .filter(Participant.event_id.in_(list(ids)))
+            .group_by(Participant.event_id)
+        )
+        return dict(results.all())
+
+    def get_version(self, db: Session, id: Any) -> Optional[int]:
+        """Get the version of an event, None if the event does not exist"""
+        result = db.query(self.model.version).filter(self.model.id == id).first()
+        return None if result is None else result[0]
+
+    def bump_version(self, db: Session, *, id: Any) -> None:
+        """Increment the version of an event, within the session's transaction"""
+        db.query(self.model).filter(self.model.id == id).update(
+            {self.model.version: self.model.version + 1},
+            synchronize_session=False,
+        )
+
+    async def get_with_participants_async(self, db: AsyncSession, id: Any) -> Event:
+        """Get event and its participants, which async code cannot load lazily"""
+        result = await db.scalar(
+            select(self.model)
+            .options(selectinload(self.model.participants))
+            .filter(self.model.id == id)
+        )
+        result = self._raise_if_unfound(result)
+        return result
+
+    async def get_version_async(self, db: AsyncSession, id: Any) -> Optional[int]:
+        return await db.scalar(select(self.model.version).filter(self.model.id == id))
+
+    async def bump_version_async(self, db: AsyncSession, *, id: Any) -> None:
+        await db.execute(
+            update(self.model)
+            .filter(self.model.id == id)
+            .values(version=self.model.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    def _list_query(
+        self,
+        db: Session,
+        participants: ParticipantsMode = ParticipantsMode.full,
+    ) -> Query:
+        query = db.query(self.model)
+
+        if participants == ParticipantsMode.full:
+            # Participants of all listed events in one more query, not one each
+            query = query.options(selectinload(self.model.participants))
+
+        return query
+
+    def _apply_update(
+        self, db_obj: Event, obj_in: Union[EventUpdate, Dict[str, Any]]
+    ) -> None:
+        super()._apply_update(db_obj, obj_in)
+        # Incremented in SQL so concurrent updates each get their own version.
+        # Set directly, as updates only apply to the fields already loaded
+        db_obj.version = self.model.version + 1
 
 
 event = CRUDEvent(Event)
@@ -1,10 +1,116 @@
+from typing import Any, Dict, Set, Union
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
 from app.crud.base import CRUDBase
+from app.crud.crud_event import event
 from app.models.participant import Participant
 from app.schemas.participant import ParticipantCreate, ParticipantUpdate
 
 
 class CRUDParticipant(CRUDBase[Participant, ParticipantCreate, ParticipantUpdate]):
-    pass
+    """Participant CRUD, every change also bumps the version of the events involved
+
+    Versions are bumped before the base methods commit, so a participant change
+    and its event's new version are committed together.
+    """
+
+    def create(self, db: Session, *, obj_in: ParticipantCreate) -> Participant:
+        event.bump_version(db, id=obj_in.event_id)
+        return super().create(db, obj_in=obj_in)
+
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: Participant,
+        obj_in: Union[ParticipantUpdate, Dict[str, Any]],
+    ) -> Participant:
+        for id in self._event_ids(db_obj, obj_in):
+            event.bump_version(db, id=id)
+
+        return super().update(db, db_obj=db_obj, obj_in=obj_in)
+
+    def remove(self, db: Session, *, id: int) -> Participant:
+        obj = db.query(self.model).get(id)
+
+        if obj is not None:
+            event.bump_version(db, id=obj.event_id)
+
+        return super().remove(db, id=id)
+
+    async def create_async(
+        self, db: AsyncSession, *, obj_in: ParticipantCreate
+    ) -> Participant:
+        await event.bump_version_async(db, id=obj_in.event_id)
+        return await super().create_async(db, obj_in=obj_in)
+
+    async def update_async(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: Participant,
+        obj_in: Union[ParticipantUpdate, Dict[str, Any]],
+    ) -> Participant:
+        for id in self._event_ids(db_obj, obj_in):
+            await event.bump_version_async(db, id=id)
+
+        return await super().update_async(db, db_obj=db_obj, obj_in=obj_in)
+
+    async def remove_async(self, db: AsyncSession, *, id: int) -> Participant:
+        obj = await db.get(self.model, id)
+
+        if obj is not None:
+            await event.bump_version_async(db, id=obj.event_id)
+
+        return await super().remove_async(db, id=id)
+
+    async def set_active_async(
+        self, db: AsyncSession, *, active: Dict[int, bool]
+    ) -> Set[int]:
+        """Set the active flags of many participants in one transaction
+
+        Participants are updated with one statement per flag value. Event
+        versions are left as they are, since cached event costs do not depend on
+        whether participants are connected.
+
+        Args:
+            active: Active flag of each participant, by participant ID
+
+        Returns: IDs of the events of the updated participants
+        """
+        ids = list(active)
+        event_ids = set(
+            await db.scalars(
+                select(self.model.event_id).filter(self.model.id.in_(ids)).distinct()
+            )
+        )
+        event_ids.discard(None)
+
+        for is_active in (True, False):
+            flag_ids = [id for id in ids if active[id] is is_active]
+
+            if flag_ids:
+                await db.execute(
+                    update(self.model)
+                    .filter(self.model.id.in_(flag_ids))
+                    .values(active=is_active)
+                    .execution_options(synchronize_session=False)
+                )
+
+        await db.commit()
+        return event_ids
+
+    def _event_ids(
+        self,
+        db_obj: Participant,
+        obj_in: Union[ParticipantUpdate, Dict[str, Any]],
+    ) -> Set[int]:
+        """Events a participant belongs to before and after an update"""
+        event_id = self._update_data(obj_in).get("event_id")
+        return {db_obj.event_id, event_id or db_obj.event_id}
 
 
 participant = CRUDParticipant(Participant)
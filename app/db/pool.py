@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+
+class PoolMetrics:
+    def __init__(self: "PoolMetrics") -> None:
+        """Connection checkout counters of a pool
+
+        Checkouts of the sync pool run on threadpool threads, so counters are
+        updated and read under a lock.
+        """
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self: "PoolMetrics") -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record(self: "PoolMetrics", wait_seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+            self.wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def snapshot(self: "PoolMetrics") -> dict[str, Any]:
+        """Consistent copy of the counters"""
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": self.wait_seconds / attempts if attempts else 0.0,
+                "wait_seconds_max": self.max_wait_seconds,
+            }
+
+
+class TimedPoolMixin:
+    """Time how long each connection checkout waits for the pool"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self: Any) -> Any:
+        start = time.perf_counter()
+        timed_out = False
+
+        try:
+            return super()._do_get()  # type: ignore
+        except TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.record(time.perf_counter() - start, timed_out)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    def __init__(self: "TimedQueuePool", *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    def __init__(self: "TimedAsyncAdaptedQueuePool", *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+
+def pool_stats(pool: QueuePool) -> dict[str, Any]:
+    """Usage and checkout wait statistics of a timed queue pool
+
+    Saturation is the share of the pool's maximum connections checked out, at 1.0
+    further checkouts wait for a connection to be returned. Pools are created
+    with DB_MAX_OVERFLOW, which the pool itself does not expose.
+    """
+    metrics: PoolMetrics = pool.metrics  # type: ignore
+    max_overflow = settings.DB_MAX_OVERFLOW
+    capacity = pool.size() + max_overflow
+    checked_out = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "max_overflow": max_overflow,
+        "timeout_seconds": pool.timeout(),
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        # Counts up from -size as connections are opened
+        "overflow": max(pool.overflow(), 0),
+        "saturation": checked_out / capacity if capacity > 0 else 0.0,
+        **metrics.snapshot(),
+    }
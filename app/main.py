@@ -4,11 +4,21 @@ from starlette.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 
 from app.api.api_v1.api import api_router
+from app.api.api_v1.broadcast import broadcast
+from app.api.api_v1.calculator_executor import calculator_executor
+from app.api.api_v1.calculators import calculators
+from app.api.api_v1.endpoints import event_cost_aggregator, flight_calculator
+from app.api.api_v1.presence import presence_buffer
+from app.core import geocoding
 from app.core.config import settings
+from app.core.serialization import ORJSONResponse
+from app.core.warmup import warmup
+from app.db.session import async_engine
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse,
 )
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -27,5 +37,60 @@ if settings.CORS_ORIGINS:
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+warmup.add_step("geocoder", geocoding.load_geocoder)
+warmup.add_step("geodesics", flight_calculator.get_geod)
+warmup.add_step("calculator_schemas", lambda: calculators.documents)
+warmup.add_step("openapi_schema", app.openapi)
+
+
+@app.on_event("startup")
+async def warm_up() -> None:
+    if not settings.WARMUP_ON_STARTUP:
+        # Without warm-up the server is ready as soon as it starts
+        warmup.skip()
+        return
+
+    if settings.WARMUP_IN_BACKGROUND:
+        warmup.start()
+    else:
+        await warmup.run()
+
+
+@app.on_event("startup")
+async def connect_broadcast() -> None:
+    await broadcast.connect()
+
+
+@app.on_event("startup")
+async def start_presence_buffer() -> None:
+    presence_buffer.start()
+
+
+# Presence is written, and published, before the broadcast and the database close
+@app.on_event("shutdown")
+async def stop_presence_buffer() -> None:
+    await presence_buffer.stop()
+
+
+@app.on_event("shutdown")
+async def disconnect_broadcast() -> None:
+    await broadcast.disconnect()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine() -> None:
+    await async_engine.dispose()
+
+
+@app.on_event("shutdown")
+def shutdown_calculator_executor() -> None:
+    calculator_executor.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_event_shard_pool() -> None:
+    event_cost_aggregator.shutdown_event_shard_pool()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -17,4 +17,6 @@ class Event(Base):
     name = Column(String)
     lon = Column(Float)
     lat = Column(Float)
+    # Incremented on every change to the event or its participants
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     participants = relationship("Participant")
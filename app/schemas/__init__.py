@@ -1,8 +1,18 @@
 from .country import Country, CountryCreate, CountryInDB, CountryUpdate
-from .event import Event, EventCreate, EventInDB, EventUpdate
+from .event import (
+    Event,
+    EventCreate,
+    EventInDB,
+    EventList,
+    EventPage,
+    EventSummary,
+    EventUpdate,
+    EventWithParticipantsCount,
+)
 from .participant import (
     Participant,
     ParticipantCreate,
     ParticipantInDB,
     ParticipantUpdate,
 )
+from .page import Page
@@ -1,6 +1,7 @@
 from enum import Enum
+from typing import Any, Callable, Hashable, Optional
 
-from pydantic import BaseModel, confloat
+from pydantic import BaseModel, PrivateAttr, confloat
 
 
 class JoinMode(str, Enum):
@@ -10,8 +11,94 @@ class JoinMode(str, Enum):
     in_person = "in_person"
 
 
+class ParticipantsMode(str, Enum):
+    """How the participants of listed events are returned"""
+
+    full = "full"
+    none = "none"
+    count = "count"
+
+
 class GeoCoordinates(BaseModel):
     """Schema for a lon-lat geo-location"""
 
     lon: confloat(ge=-180.0, lt=180.0)
     lat: confloat(ge=-90.0, lt=90.0)
+
+
+class DetailLevel(str, Enum):
+    """Levels of detail of aggregated cost responses"""
+
+    totals = "totals"
+    paths = "paths"
+    full = "full"
+
+
+class ResponseProjection(BaseModel):
+    """Selection of the parts of a response to build and return
+
+    `detail` prunes nested parts of a response below the given level. `include`
+    and `exclude` select fields by dotted path from the response root, lists
+    being transparent, e.g. `cost_paths.total_carbon_kg`. Including a field keeps
+    its ancestors and all of its descendants, exclusions then remove fields and
+    their descendants.
+    """
+
+    detail: DetailLevel = DetailLevel.full
+    include: Optional[set[str]] = None
+    exclude: Optional[set[str]] = None
+    # Path of the nested part of the response the projection applies to
+    _path: tuple[str, ...] = PrivateAttr(default=())
+
+    @property
+    def is_full(self: "ResponseProjection") -> bool:
+        return self.detail == DetailLevel.full and not self.include and not self.exclude
+
+    @property
+    def cache_key(self: "ResponseProjection") -> Hashable:
+        return (
+            self.detail,
+            frozenset(self.include or ()),
+            frozenset(self.exclude or ()),
+        )
+
+    def scoped(self: "ResponseProjection", field: str) -> "ResponseProjection":
+        """Projection of the nested part of the response under a field"""
+        projection = self.copy()
+        projection._path = (*self._path, field)
+        return projection
+
+    def wants(self: "ResponseProjection", field: str) -> bool:
+        path = (*self._path, field)
+
+        if self.include and not any(
+            _is_ancestor_or_self(path, included) or _is_ancestor_or_self(included, path)
+            for included in _split_paths(self.include)
+        ):
+            return False
+
+        return not self.exclude or not any(
+            _is_ancestor_or_self(excluded, path)
+            for excluded in _split_paths(self.exclude)
+        )
+
+    def project(
+        self: "ResponseProjection",
+        fields: dict[str, Callable[[], Any]],
+    ) -> dict[str, Any]:
+        """Build the wanted fields of a response, skipping the others entirely
+
+        Args:
+            fields: Field names and functions building their values
+
+        Returns: Values of wanted fields
+        """
+        return {name: build() for name, build in fields.items() if self.wants(name)}
+
+
+def _split_paths(paths: set[str]) -> list[tuple[str, ...]]:
+    return [tuple(path.split(".")) for path in paths]
+
+
+def _is_ancestor_or_self(path: tuple[str, ...], other: tuple[str, ...]) -> bool:
+    return other[: len(path)] == path
@@ -1,6 +1,6 @@
 from typing import Optional, Union, Any, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Extra
 from pydantic.utils import GetterDict
 
 
@@ -8,6 +8,7 @@ from pydantic.utils import GetterDict
 from starlette.websockets import WebSocket
 
 from app.schemas.common import GeoCoordinates, JoinMode
+from app.schemas.page import Page
 from app.schemas.participant import Participant, ParticipantInDB
 
 
@@ -40,6 +41,7 @@ class EventInDBBase(EventBase):
     lon: float
     lat: float
     participants: List[ParticipantInDB] = []
+    version: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -53,3 +55,28 @@ class EventInDB(EventInDBBase):
 # Properties to return to client
 class Event(EventInDBBase):
     pass
+
+
+# Properties to return to client when listing events without their participants
+class EventSummary(BaseModel):
+    id: int
+    name: str
+    lon: float
+    lat: float
+    version: Optional[int] = None
+
+    # Event lists are validated against a union of event schemas. Without
+    # orm_mode and with extra fields forbidden, events loaded with their
+    # participants never validate as summaries
+    class Config:
+        extra = Extra.forbid
+
+
+# Properties to return to client when listing events with participant counts
+class EventWithParticipantsCount(EventSummary):
+    participants_count: int
+
+
+# Event lists by participants mode, most specific first as the first match wins
+EventList = Union[List[EventWithParticipantsCount], List[EventSummary], List[Event]]
+EventPage = Union[Page[EventWithParticipantsCount], Page[EventSummary], Page[Event]]
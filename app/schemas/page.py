@@ -0,0 +1,15 @@
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic.generics import GenericModel
+
+ItemT = TypeVar("ItemT")
+
+
+class Page(GenericModel, Generic[ItemT]):
+    """Page of a list, and the cursor to pass to get the next page
+
+    `next_cursor` is None on the last page.
+    """
+
+    items: List[ItemT]
+    next_cursor: Optional[str] = None
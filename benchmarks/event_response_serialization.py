@@ -0,0 +1,74 @@
+"""Compare JSON encoding cost of an event cost response, before and after orjson
+
+Builds the cost response of a synthetic event and times FastAPI's default
+encoding, `jsonable_encoder` followed by `json.dumps`, against the app's
+`ORJSONResponse` encoding of the same response.
+
+Usage: python -m benchmarks.event_response_serialization [--participants 1000]
+"""
+import argparse
+import asyncio
+import json
+import random
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from app.api.api_v1.endpoints.event_cost_aggregator import (
+    compute_event_costs,
+    EventCostAggregatorRequest,
+    EventCostAggregatorResponse,
+)
+from app.core.serialization import dumps
+from app.schemas import Event, Participant
+from app.schemas.common import JoinMode
+
+
+def build_event_request(participants_count: int) -> EventCostAggregatorRequest:
+    rng = random.Random(0)
+    participants = [
+        Participant(
+            id=i,
+            event_id=1,
+            join_mode=rng.choice([JoinMode.in_person, JoinMode.online]),
+            lat=rng.uniform(-60.0, 70.0),
+            lon=rng.uniform(-180.0, 180.0),
+            active=True,
+        )
+        for i in range(participants_count)
+    ]
+    event = Event(id=1, name="Benchmark", lat=52.52, lon=13.40)
+    return EventCostAggregatorRequest(event=event, participants=participants)
+
+
+def encode_default(response: EventCostAggregatorResponse) -> bytes:
+    return json.dumps(jsonable_encoder(response)).encode()
+
+
+def encode_orjson(response: EventCostAggregatorResponse) -> bytes:
+    return dumps(response)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    request = build_event_request(args.participants)
+    response = asyncio.run(compute_event_costs(request))
+
+    if json.loads(encode_default(response)) != json.loads(encode_orjson(response)):
+        raise SystemExit("Encodings differ")
+
+    size = len(encode_orjson(response))
+    print(f"{args.participants} participants, {size / 1024:.0f} KiB response")
+
+    for name, encode in [("default", encode_default), ("orjson", encode_orjson)]:
+        timings = timeit.repeat(lambda: encode(response), number=1, repeat=args.repeat)
+        seconds = min(timings)
+        print(f"{name:>8}: {seconds * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,5 +6,8 @@ python ./prestart.py
 # Run migrations
 alembic upgrade head
 
+# Build the geocoder index shared by all workers
+python -m app.core.geocoding
+
 # Create initial data in DB
 python ./initial_data.py
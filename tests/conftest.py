@@ -0,0 +1,54 @@
+import asyncio
+from typing import Iterator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import deps
+from app.api.api_v1.api import api_router
+from app.db.base import Base
+
+
+@pytest.fixture
+def engine() -> Iterator[Engine]:
+    """In-memory SQLite database with all tables, shared by every session"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine: Engine) -> Iterator[Session]:
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db: Session) -> Iterator[TestClient]:
+    """Client of the API, whose endpoints use the test database session
+
+    The client runs the app on the current event loop, which tests running
+    their own loop leave unset.
+    """
+    app = FastAPI()
+    app.include_router(api_router)
+    app.dependency_overrides[deps.get_db] = lambda: db
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    with TestClient(app) as client:
+        yield client
+
+    asyncio.set_event_loop(None)
+    loop.close()
@@ -0,0 +1,102 @@
+"""Postgres LISTEN/NOTIFY broadcast between workers
+
+Needs the database configured by the POSTGRES_* settings, for instance the one
+started by `docker-compose up --detach database`, and is skipped without it.
+"""
+
+import asyncio
+import uuid
+
+import psycopg2
+import pytest
+
+from app.api.api_v1.broadcast import PostgresBroadcast
+from app.core.config import settings
+from app.db.session import async_engine
+
+timeout = 5.0
+
+
+@pytest.fixture(scope="module")
+def dsn() -> str:
+    # libpq does not understand SQLAlchemy driver suffixes such as "+psycopg2"
+    dsn = str(settings.SQLALCHEMY_DATABASE_URI).replace("+psycopg2", "")
+
+    try:
+        psycopg2.connect(dsn, connect_timeout=1).close()
+    except psycopg2.OperationalError as error:
+        pytest.skip(f"Postgres is not available: {error}")
+
+    return dsn
+
+
+def subscribe(broadcast: PostgresBroadcast) -> "asyncio.Queue[int]":
+    received: asyncio.Queue[int] = asyncio.Queue()
+    broadcast.subscribe(received.put_nowait)
+    return received
+
+
+def terminate_listener(dsn: str, broadcast: PostgresBroadcast) -> int:
+    """Terminate the listener connection from the server side, like a restart"""
+    pid = broadcast._connection.get_backend_pid()
+    connection = psycopg2.connect(dsn)
+
+    try:
+        with connection, connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+    finally:
+        connection.close()
+
+    return pid
+
+
+async def wait_for_reconnection(broadcast: PostgresBroadcast, pid: int) -> None:
+    while (
+        broadcast._connection is None or broadcast._connection.get_backend_pid() == pid
+    ):
+        await asyncio.sleep(0.01)
+
+
+def test_publish_reaches_other_worker(dsn: str) -> None:
+    async def scenario() -> None:
+        channel = f"test_{uuid.uuid4().hex}"
+        publisher = PostgresBroadcast(dsn, channel=channel)
+        listener = PostgresBroadcast(dsn, channel=channel)
+        published, received = subscribe(publisher), subscribe(listener)
+        await publisher.connect()
+        await listener.connect()
+
+        try:
+            await publisher.publish(1)
+            assert await asyncio.wait_for(received.get(), timeout) == 1
+            # Workers also receive their own notifications
+            assert await asyncio.wait_for(published.get(), timeout) == 1
+        finally:
+            await publisher.disconnect()
+            await listener.disconnect()
+            await async_engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_publish_reaches_other_worker_after_reconnection(dsn: str) -> None:
+    async def scenario() -> None:
+        channel = f"test_{uuid.uuid4().hex}"
+        publisher = PostgresBroadcast(dsn, channel=channel)
+        listener = PostgresBroadcast(dsn, channel=channel, reconnect_delay=0.05)
+        received = subscribe(listener)
+        await publisher.connect()
+        await listener.connect()
+
+        try:
+            pid = terminate_listener(dsn, listener)
+            await asyncio.wait_for(wait_for_reconnection(listener, pid), timeout)
+
+            await publisher.publish(2)
+            assert await asyncio.wait_for(received.get(), timeout) == 2
+        finally:
+            await publisher.disconnect()
+            await listener.disconnect()
+            await async_engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,172 @@
+import asyncio
+import json
+from typing import Any, Optional
+
+import pytest
+from fastapi import FastAPI
+
+from app.api.api_v1.calculator_executor import calculator_executor
+from app.api.api_v1.endpoints import cost_aggregator
+from app.api.api_v1.endpoints.cost_aggregator import aggregate_ndjson_chunk
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.schemas.common import ResponseProjection
+
+failing_lat = 12.34
+
+
+def flight_line(start_lat: float = 48.85, request: Optional[Any] = None) -> bytes:
+    if request is None:
+        stage = {
+            "start": {"lon": 2.35, "lat": start_lat},
+            "end": {"lon": 13.40, "lat": 52.52},
+            "start_iso_code": "FR",
+            "end_iso_code": "DE",
+        }
+        request = {"stages": [stage]}
+
+    cost_item = {"calculator_name": "flight_calculator", "request": request}
+    content = {"cost_paths": [{"title": "in_person", "cost_items": [cost_item]}]}
+    return json.dumps(content).encode()
+
+
+def aggregate(
+    lines: list[bytes],
+    projection: Optional[ResponseProjection] = None,
+) -> list[dict[str, Any]]:
+    """Results of lines as streamed back, decoded from JSON"""
+    numbered = list(enumerate(lines, start=1))
+    projection = projection or ResponseProjection()
+    results = asyncio.run(aggregate_ndjson_chunk(numbered, projection))
+    return json.loads(dumps(results))
+
+
+def post_bulk(chunks: list[bytes]) -> list[dict[str, Any]]:
+    """Results of a bulk request whose body is received in `chunks`
+
+    Like a server, the body is received message by message, and a disconnect
+    only once the response is complete.
+    """
+    app = FastAPI()
+    app.include_router(cost_aggregator.router)
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/cost-aggregator/bulk",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/x-ndjson")],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks
+    ]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    body = []
+
+    async def run() -> None:
+        response_complete = asyncio.Event()
+
+        async def receive() -> dict[str, Any]:
+            if messages:
+                return messages.pop(0)
+
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.body":
+                body.append(message["body"])
+
+                if not message.get("more_body", False):
+                    response_complete.set()
+
+        await asyncio.wait_for(app(scope, receive, send), timeout=30)
+
+    asyncio.run(run())
+    assert not messages, "Request body not read completely"
+    return [json.loads(line) for line in b"".join(body).splitlines()]
+
+
+def split(content: bytes, size: int) -> list[bytes]:
+    return [content[i : i + size] for i in range(0, len(content), size)]
+
+
+def long_flight_line(max_line_bytes: int) -> bytes:
+    """Valid request line longer than `max_line_bytes`, padded with spaces"""
+    line = flight_line()
+    return line[:-1] + b" " * (max_line_bytes - len(line) + 1) + line[-1:]
+
+
+def test_request_of_wrong_type_fails_its_line_only() -> None:
+    results = aggregate([flight_line(), flight_line(request=[]), flight_line()])
+
+    assert [result["line"] for result in results] == [1, 2, 3]
+    assert "response" in results[0] and "response" in results[2]
+    assert "error" in results[1]
+
+
+def test_calculator_failure_fails_its_line_only(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    run_batch = calculator_executor.run_batch
+
+    async def failing_run_batch(calculator: Any, requests: list[Any]) -> list[Any]:
+        for request in requests:
+            if request.stages[0].start.lat == failing_lat:
+                raise RuntimeError("Calculator failed")
+
+        return await run_batch(calculator, requests)
+
+    monkeypatch.setattr(
+        cost_aggregator.calculator_executor, "run_batch", failing_run_batch
+    )
+    results = aggregate([flight_line(), flight_line(failing_lat), flight_line()])
+
+    assert [result["line"] for result in results] == [1, 2, 3]
+    assert results[0]["response"] == results[2]["response"]
+    assert results[1]["error"] == "Calculation failed: RuntimeError"
+
+
+def test_include_keeps_ancestors_of_nested_fields() -> None:
+    projection = ResponseProjection(include={"cost_paths.total_carbon_kg"})
+    (result,) = aggregate([flight_line()], projection)
+
+    (full,) = aggregate([flight_line()])
+    total_carbon_kg = full["response"]["cost_paths"][0]["total_carbon_kg"]
+    assert result["response"] == {"cost_paths": [{"total_carbon_kg": total_carbon_kg}]}
+
+
+def test_exclude_applies_within_included_fields() -> None:
+    projection = ResponseProjection(
+        include={"cost_paths"}, exclude={"cost_paths.cost_items"}
+    )
+    (result,) = aggregate([flight_line()], projection)
+
+    (path,) = result["response"]["cost_paths"]
+    assert set(path) == {"title", "total_carbon_kg"}
+
+
+def test_body_received_in_chunks_gets_all_results() -> None:
+    lines = [flight_line(40 + i / 10) for i in range(200)]
+    results = post_bulk(split(b"\n".join(lines), 1000))
+
+    assert [result["line"] for result in results] == list(range(1, 201))
+    assert all("response" in result for result in results)
+
+
+@pytest.mark.parametrize("chunk_size", [64 * 1024, 100])
+def test_line_over_max_bytes_fails_however_it_is_chunked(
+    monkeypatch: pytest.MonkeyPatch, chunk_size: int
+) -> None:
+    max_line_bytes = 1000
+    monkeypatch.setattr(settings, "COST_AGGREGATOR_BULK_MAX_LINE_BYTES", max_line_bytes)
+    lines = [flight_line(), long_flight_line(max_line_bytes), flight_line()]
+    results = post_bulk(split(b"\n".join(lines), chunk_size))
+
+    assert [result["line"] for result in results] == [1, 2, 3]
+    assert "response" in results[0] and "response" in results[2]
+    assert results[1]["error"] == "Line exceeds COST_AGGREGATOR_BULK_MAX_LINE_BYTES"
@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from app.api.api_v1.calculator_executor import calculator_executor
+from app.api.api_v1.endpoints.cost_aggregator import (
+    aggregate_cost_paths,
+    validate_request_paths,
+    CostAggregatorRequest,
+    CostAggregatorResponse,
+)
+from app.api.api_v1.endpoints.event_cost_aggregator import (
+    build_in_person_cost_path,
+    build_online_cost_path,
+    compute_event_costs,
+    shutdown_event_shard_pool,
+    EventCostAggregatorRequest,
+    EventCostAggregatorResponse,
+)
+from app.core.config import settings
+from app.core.geocoding import search_iso_codes
+from app.core.serialization import dumps
+from app.schemas import Event, Participant
+from app.schemas.common import GeoCoordinates, JoinMode
+
+event = Event(id=1, name="Berlin", lon=13.40, lat=52.52)
+
+
+@pytest.fixture(autouse=True)
+def calculator_semaphore(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Bind the calculator concurrency limit to the event loop of each test"""
+    monkeypatch.setattr(calculator_executor, "_semaphore", None)
+
+
+def random_participants(count: int, seed: int = 0) -> list[Participant]:
+    rng = np.random.default_rng(seed)
+    join_modes = [JoinMode.in_person, JoinMode.online]
+    return [
+        Participant(
+            id=id,
+            join_mode=join_modes[id % 2],
+            lat=rng.uniform(-60, 70),
+            lon=rng.uniform(-180, 180),
+            active=True,
+            event_id=event.id,
+        )
+        for id in range(1, count + 1)
+    ]
+
+
+async def aggregate_participant(
+    participant: Participant, total_participants: int
+) -> CostAggregatorResponse:
+    """Costs of a participant as posted on its own to the cost aggregator"""
+    start = GeoCoordinates(lon=participant.lon, lat=participant.lat)
+    end = GeoCoordinates(lon=event.lon, lat=event.lat)
+    start_iso_code, end_iso_code = search_iso_codes([start, end])
+    cost_paths = [
+        build_in_person_cost_path(start, end, start_iso_code, end_iso_code),
+        build_online_cost_path(total_participants),
+    ]
+    request = CostAggregatorRequest.parse_raw(dumps({"cost_paths": cost_paths}))
+    (response,) = await aggregate_cost_paths(
+        [validate_request_paths(request.cost_paths)]
+    )
+    return response
+
+
+async def aggregate_per_participant(
+    participants: list[Participant],
+) -> EventCostAggregatorResponse:
+    """Event costs summed from the cost aggregator response of each participant"""
+    responses = await asyncio.gather(
+        *(aggregate_participant(p, len(participants)) for p in participants)
+    )
+    totals = {"in_person": 0.0, "online": 0.0, "actual": 0.0}
+
+    for participant, response in zip(participants, responses):
+        for path in response.cost_paths:
+            totals[path.title] += path.total_carbon_kg
+
+            if path.title == JoinMode(participant.join_mode).value:
+                totals["actual"] += path.total_carbon_kg
+
+    return EventCostAggregatorResponse(
+        in_person_total_carbon_kg=totals["in_person"],
+        online_total_carbon_kg=totals["online"],
+        actual_total_carbon_kg=totals["actual"],
+        participant_cost_aggregator_responses=responses,
+    )
+
+
+def assert_same_costs(
+    actual: EventCostAggregatorResponse, expected: EventCostAggregatorResponse
+) -> None:
+    for total in [
+        "in_person_total_carbon_kg",
+        "online_total_carbon_kg",
+        "actual_total_carbon_kg",
+    ]:
+        assert getattr(actual, total) == pytest.approx(
+            getattr(expected, total), rel=1e-9
+        )
+
+    actual_participants = actual.participant_cost_aggregator_responses
+    expected_participants = expected.participant_cost_aggregator_responses
+    assert len(actual_participants) == len(expected_participants)
+
+    for actual_participant, expected_participant in zip(
+        actual_participants, expected_participants
+    ):
+        actual_paths = actual_participant.cost_paths
+        expected_paths = expected_participant.cost_paths
+        assert [path.title for path in actual_paths] == [
+            path.title for path in expected_paths
+        ]
+        assert [path.total_carbon_kg for path in actual_paths] == pytest.approx(
+            [path.total_carbon_kg for path in expected_paths], rel=1e-9
+        )
+
+
+async def compute(participants: list[Participant]) -> EventCostAggregatorResponse:
+    request = EventCostAggregatorRequest.construct(
+        event=event, participants=participants
+    )
+    return await compute_event_costs(request)
+
+
+def test_vectorized_costs_match_per_participant_costs() -> None:
+    async def scenario() -> None:
+        participants = random_participants(300)
+
+        expected = await aggregate_per_participant(participants)
+        assert_same_costs(await compute(participants), expected)
+
+    asyncio.run(scenario())
+
+
+def test_sharded_costs_match_per_participant_costs(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def scenario() -> None:
+        participants = random_participants(300, seed=1)
+        unsharded = await compute(participants)
+
+        monkeypatch.setattr(settings, "EVENT_SHARD_THRESHOLD", 100)
+        monkeypatch.setattr(settings, "EVENT_SHARD_SIZE", 64)
+
+        try:
+            sharded = await compute(participants)
+        finally:
+            shutdown_event_shard_pool()
+
+        expected = await aggregate_per_participant(participants)
+        assert_same_costs(sharded, expected)
+        assert json.loads(dumps(sharded)) == json.loads(dumps(unsharded))
+
+    asyncio.run(scenario())
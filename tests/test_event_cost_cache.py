@@ -0,0 +1,120 @@
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.api.api_v1.endpoints.event_cost_aggregator import event_costs_cache
+from app.schemas import EventCreate, ParticipantCreate
+from app.schemas.common import JoinMode
+
+
+@pytest.fixture(autouse=True)
+def empty_cache() -> None:
+    event_costs_cache.clear()
+
+
+def create_event(db: Session, name: str = "Berlin") -> models.Event:
+    return crud.event.create(db, obj_in=EventCreate(name=name, lon=13.40, lat=52.52))
+
+
+def participant_in(event: models.Event, lat: float = 48.85) -> ParticipantCreate:
+    return ParticipantCreate(
+        event_id=event.id, join_mode=JoinMode.in_person, lat=lat, lon=2.35
+    )
+
+
+def version(db: Session, event: models.Event) -> int:
+    return crud.event.get_version(db, event.id)
+
+
+def test_participant_changes_bump_event_versions(db: Session) -> None:
+    event = create_event(db)
+    other_event = create_event(db, "Paris")
+    initial = version(db, event)
+
+    participant = crud.participant.create(db, obj_in=participant_in(event))
+    assert version(db, event) == initial + 1
+
+    participant = crud.participant.update(db, db_obj=participant, obj_in={"lat": 45.0})
+    assert version(db, event) == initial + 2
+
+    # Moving a participant changes both events
+    other_initial = version(db, other_event)
+    participant = crud.participant.update(
+        db, db_obj=participant, obj_in={"event_id": other_event.id}
+    )
+    assert version(db, event) == initial + 3
+    assert version(db, other_event) == other_initial + 1
+
+    crud.participant.remove(db, id=participant.id)
+    assert version(db, other_event) == other_initial + 2
+
+    crud.event.update(db, db_obj=event, obj_in={"name": "Berlin 2"})
+    assert version(db, event) == initial + 4
+
+
+def test_cached_costs_are_replaced_after_participant_changes(
+    db: Session, client: TestClient
+) -> None:
+    event = create_event(db)
+    url = f"/event-cost-aggregator/{event.id}"
+    responses = []
+
+    def read_costs() -> dict[str, Any]:
+        response = client.get(url)
+        assert response.status_code == 200
+        responses.append(response)
+        return response.json()
+
+    def assert_cache_missed() -> None:
+        etag = responses[-1].headers["ETag"]
+        misses = event_costs_cache.misses
+        response = client.get(url, headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert event_costs_cache.misses == misses + 1
+
+    read_costs()
+    participant = client.post("/participants/", data=participant_in(event).json())
+    participant_id = participant.json()["id"]
+    assert_cache_missed()
+    costs = read_costs()
+    assert len(costs["participant_cost_aggregator_responses"]) == 1
+
+    client.put(f"/participants/{participant_id}", json={"lat": 40.42, "lon": -3.70})
+    assert_cache_missed()
+    moved_costs = read_costs()
+    assert (
+        moved_costs["in_person_total_carbon_kg"] != costs["in_person_total_carbon_kg"]
+    )
+
+    client.delete(f"/participants/{participant_id}")
+    assert_cache_missed()
+    assert read_costs()["participant_cost_aggregator_responses"] == []
+
+
+def test_unchanged_event_is_served_from_cache_or_not_modified(
+    db: Session, client: TestClient
+) -> None:
+    event = create_event(db)
+    crud.participant.create(db, obj_in=participant_in(event))
+    url = f"/event-cost-aggregator/{event.id}"
+
+    response = client.get(url)
+    hits = event_costs_cache.hits
+    cached = client.get(url)
+
+    assert cached.content == response.content
+    assert cached.headers["ETag"] == response.headers["ETag"]
+    assert event_costs_cache.hits == hits + 1
+
+    not_modified = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+def test_missing_event_is_not_found(client: TestClient) -> None:
+    assert client.get("/event-cost-aggregator/1").status_code == 404
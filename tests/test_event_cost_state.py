@@ -0,0 +1,145 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from app.api.api_v1.calculator_executor import calculator_executor
+from app.api.api_v1.endpoints import online_calculator
+from app.api.api_v1.endpoints.event_cost_aggregator import (
+    compute_event_costs,
+    EventCostAggregatorRequest,
+)
+from app.api.api_v1.event_cost_state import EventCostState
+from app.schemas import Event, Participant
+from app.schemas.common import JoinMode
+
+event = Event(id=1, name="Berlin", lon=13.40, lat=52.52)
+
+totals = [
+    "in_person_total_carbon_kg",
+    "online_total_carbon_kg",
+    "actual_total_carbon_kg",
+]
+
+
+def participant(
+    id: int, lat: float, lon: float, join_mode: JoinMode = JoinMode.in_person
+) -> Participant:
+    return Participant(
+        id=id, join_mode=join_mode, lat=lat, lon=lon, active=True, event_id=event.id
+    )
+
+
+paris = participant(1, 48.85, 2.35)
+madrid = participant(2, 40.42, -3.70, JoinMode.online)
+rome = participant(3, 41.90, 12.50)
+oslo = participant(4, 59.91, 10.75, JoinMode.online)
+
+
+@pytest.fixture(autouse=True)
+def online_cost_per_participant(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Share the cost of the online call among its participants
+
+    The online cost of each participant then changes with the participant count,
+    which cached results would hide.
+    """
+    calculate = online_calculator.online_calculator
+
+    async def calculate_per_participant(body: Any) -> Any:
+        response = await calculate(body)
+        emissions = response.total_emissions
+        shared = {
+            "low": emissions.low / body.total_participants,
+            "high": emissions.high / body.total_participants,
+        }
+        return response.copy(update={"total_emissions": emissions.copy(update=shared)})
+
+    monkeypatch.setattr(
+        online_calculator, "online_calculator", calculate_per_participant
+    )
+    monkeypatch.setattr(calculator_executor, "result_cache", None)
+
+
+async def assert_matches_full_recompute(state: EventCostState) -> None:
+    request = EventCostAggregatorRequest.construct(
+        event=event, participants=state.participants
+    )
+    expected = await compute_event_costs(request)
+    response = state.response()
+
+    for total in totals:
+        assert getattr(response, total) == pytest.approx(getattr(expected, total))
+
+    actual_participants = response.participant_cost_aggregator_responses
+    expected_participants = expected.participant_cost_aggregator_responses
+    assert len(actual_participants) == len(expected_participants)
+
+    for actual_participant, expected_participant in zip(
+        actual_participants, expected_participants
+    ):
+        actual_paths = actual_participant.cost_paths
+        expected_paths = expected_participant.cost_paths
+        assert [path.total_carbon_kg for path in actual_paths] == pytest.approx(
+            [path.total_carbon_kg for path in expected_paths]
+        )
+
+    assert await state.verify()
+
+
+def test_join_leave_and_move_match_full_recompute() -> None:
+    async def scenario() -> None:
+        state = EventCostState(event)
+        await state.sync([paris, madrid])
+        await assert_matches_full_recompute(state)
+
+        # Only the participant joining is calculated
+        updates = state.updates
+        await state.sync([paris, madrid, rome])
+        assert state.updates == updates + 1
+        await assert_matches_full_recompute(state)
+
+        await state.sync([paris, rome])
+        await assert_matches_full_recompute(state)
+
+        moved_rome = rome.copy(update={"lat": 45.46, "lon": 9.19})
+        await state.sync([paris, moved_rome])
+        await assert_matches_full_recompute(state)
+
+        online_paris = paris.copy(update={"join_mode": JoinMode.online})
+        await state.sync([online_paris, moved_rome])
+        await assert_matches_full_recompute(state)
+
+        await state.sync([])
+        assert [getattr(state, total) for total in totals] == pytest.approx([0] * 3)
+
+    asyncio.run(scenario())
+
+
+def test_online_cost_follows_participant_count() -> None:
+    async def scenario() -> None:
+        state = EventCostState(event)
+        await state.sync([paris, madrid])
+        online_carbon_kg = state.online_carbon_kg
+
+        await state.sync([paris, madrid, rome, oslo])
+        assert state.online_carbon_kg == pytest.approx(online_carbon_kg / 2)
+        await assert_matches_full_recompute(state)
+
+        await state.sync([madrid])
+        assert state.online_carbon_kg == pytest.approx(online_carbon_kg * 2)
+        await assert_matches_full_recompute(state)
+
+    asyncio.run(scenario())
+
+
+def test_verify_detects_drift_and_reset_clears_it() -> None:
+    async def scenario() -> None:
+        state = EventCostState(event)
+        await state.sync([paris, madrid, rome])
+        state._in_person_carbon_kg += 1.0
+
+        assert not await state.verify()
+        await state.reset()
+        await assert_matches_full_recompute(state)
+
+    asyncio.run(scenario())
@@ -0,0 +1,123 @@
+from typing import Any, Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.schemas import EventCreate, ParticipantCreate
+from app.schemas.common import JoinMode
+
+summary_fields = {"id", "name", "lon", "lat", "version"}
+
+
+class StatementCounter:
+    def __init__(self: "StatementCounter") -> None:
+        self.count = 0
+
+    def __call__(self: "StatementCounter", *args: Any) -> None:
+        self.count += 1
+
+
+@pytest.fixture
+def statements(engine: Engine) -> Iterator[StatementCounter]:
+    """Counts the statements executed on the test database"""
+    counter = StatementCounter()
+    sqlalchemy_event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    sqlalchemy_event.remove(engine, "before_cursor_execute", counter)
+
+
+@pytest.fixture
+def participants_counts(db: Session) -> dict[int, int]:
+    """Number of participants of each of 20 events, some without any"""
+    counts = {}
+
+    for i in range(20):
+        event_in = EventCreate(name=f"Event {i}", lon=13.40, lat=52.52)
+        event_id = crud.event.create(db, obj_in=event_in).id
+        counts[event_id] = i % 4
+
+        for _ in range(i % 4):
+            participant_in = ParticipantCreate(
+                event_id=event_id, join_mode=JoinMode.online, lat=48.85, lon=2.35
+            )
+            crud.participant.create(db, obj_in=participant_in)
+
+    return counts
+
+
+def read_events(
+    client: TestClient, statements: StatementCounter, url: str, **params: Any
+) -> tuple[Any, int]:
+    """Response content of a list of events and the statements it executed"""
+    count = statements.count
+    response = client.get(url, params={"limit": 100, **params})
+    assert response.status_code == 200
+    return response.json(), statements.count - count
+
+
+@pytest.mark.parametrize("url", ["/events/", "/events/page"])
+@pytest.mark.parametrize(
+    "participants, expected_statements",
+    [("full", 2), ("none", 1), ("count", 2)],
+)
+def test_events_are_listed_in_constant_statements(
+    client: TestClient,
+    statements: StatementCounter,
+    participants_counts: dict[int, int],
+    url: str,
+    participants: str,
+    expected_statements: int,
+) -> None:
+    # One statement per participant would make it 20 more
+    _, executed = read_events(client, statements, url, participants=participants)
+
+    assert executed == expected_statements
+
+
+def test_full_mode_lists_participants(
+    client: TestClient,
+    statements: StatementCounter,
+    participants_counts: dict[int, int],
+) -> None:
+    events, _ = read_events(client, statements, "/events/")
+    page, _ = read_events(client, statements, "/events/page", participants="full")
+
+    assert page["items"] == events
+    assert {event["id"]: len(event["participants"]) for event in events} == (
+        participants_counts
+    )
+    assert all(set(event) == {*summary_fields, "participants"} for event in events)
+
+
+def test_none_mode_lists_summaries(
+    client: TestClient,
+    statements: StatementCounter,
+    participants_counts: dict[int, int],
+) -> None:
+    events, _ = read_events(client, statements, "/events/", participants="none")
+    page, _ = read_events(client, statements, "/events/page", participants="none")
+
+    assert page["items"] == events
+    assert [event["id"] for event in events] == list(participants_counts)
+    assert all(set(event) == summary_fields for event in events)
+
+
+def test_count_mode_lists_participants_counts(
+    client: TestClient,
+    statements: StatementCounter,
+    participants_counts: dict[int, int],
+) -> None:
+    events, _ = read_events(client, statements, "/events/", participants="count")
+    page, _ = read_events(client, statements, "/events/page", participants="count")
+
+    assert page["items"] == events
+    assert {event["id"]: event["participants_count"] for event in events} == (
+        participants_counts
+    )
+    assert all(
+        set(event) == {*summary_fields, "participants_count"} for event in events
+    )
@@ -0,0 +1,131 @@
+import base64
+import json
+from typing import Any, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud, schemas
+from app.api import export
+from app.crud.base import encode_cursor
+from app.schemas import EventCreate, ParticipantCreate
+from app.schemas.common import JoinMode
+
+
+def create_events(db: Session, count: int) -> list[int]:
+    return [
+        crud.event.create(
+            db, obj_in=EventCreate(name=f"Event {i}", lon=13.40, lat=52.52)
+        ).id
+        for i in range(count)
+    ]
+
+
+def read_all_pages(
+    client: TestClient, url: str, limit: int, between_pages: Any = None
+) -> list[int]:
+    """IDs of the items of every page, following `next_cursor` to the end"""
+    ids: list[int] = []
+    cursor: Optional[str] = None
+
+    while True:
+        params: dict[str, Any] = {"limit": limit}
+
+        if cursor is not None:
+            params["cursor"] = cursor
+
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= limit
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+
+        if cursor is None:
+            return ids
+
+        if between_pages is not None:
+            between_pages()
+
+
+def test_pages_cover_every_event_once(db: Session, client: TestClient) -> None:
+    ids = create_events(db, 25)
+
+    assert read_all_pages(client, "/events/page", limit=10) == ids
+    assert read_all_pages(client, "/events/page", limit=25) == ids
+    assert read_all_pages(client, "/events/page", limit=1000) == ids
+
+
+def test_pages_stay_consistent_when_rows_change(
+    db: Session, client: TestClient
+) -> None:
+    ids = create_events(db, 9)
+    removed = ids[0]
+
+    def change_rows() -> None:
+        # Removing a row already read would make an offset skip the next one
+        if crud.event.get_version(db, removed) is not None:
+            crud.event.remove(db, id=removed)
+
+    assert read_all_pages(client, "/events/page", 4, change_rows) == ids
+
+
+def test_participant_pages_cover_every_participant_once(
+    db: Session, client: TestClient
+) -> None:
+    (event_id,) = create_events(db, 1)
+    ids = [
+        crud.participant.create(
+            db,
+            obj_in=ParticipantCreate(
+                event_id=event_id, join_mode=JoinMode.online, lat=48.85, lon=2.35
+            ),
+        ).id
+        for _ in range(7)
+    ]
+
+    assert read_all_pages(client, "/participants/page", limit=3) == ids
+
+
+def test_last_page_has_no_cursor(db: Session, client: TestClient) -> None:
+    ids = create_events(db, 2)
+
+    page = client.get("/events/page", params={"cursor": encode_cursor(ids[-1])})
+    assert page.json() == {"items": [], "next_cursor": None}
+
+
+def encode(content: bytes) -> str:
+    return base64.urlsafe_b64encode(content).decode()
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        encode(b"not json"),
+        encode(json.dumps({"offset": 10}).encode()),
+        encode(json.dumps({"id": "10"}).encode()),
+        encode(json.dumps([10]).encode()),
+    ],
+)
+def test_invalid_cursor_is_rejected(client: TestClient, cursor: str) -> None:
+    response = client.get("/events/page", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_export_streams_every_row_in_batches(
+    db: Session, engine: Engine, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ids = create_events(db, 7)
+    monkeypatch.setattr(export, "SessionLocal", sessionmaker(bind=engine))
+
+    chunks = list(export.iter_ndjson_export(crud.event, schemas.Event, 3))
+    lines = b"".join(chunks).splitlines()
+
+    assert [chunk.count(b"\n") for chunk in chunks] == [3, 3, 1]
+    assert [json.loads(line)["id"] for line in lines] == ids
+    assert schemas.Event.parse_raw(lines[0]).name == "Event 0"
@@ -0,0 +1,103 @@
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.api.api_v1 import presence
+from app.api.api_v1.presence import PresenceBuffer
+from app.db.base import Base
+from app.schemas import EventCreate, ParticipantCreate
+from app.schemas.common import JoinMode
+
+pytest.importorskip("aiosqlite")
+
+
+def test_flush_writes_one_update_per_flag_then_publishes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    event_ids = [
+        crud.event.create(db, obj_in=EventCreate(name=name, lon=13.40, lat=52.52)).id
+        for name in ["Berlin", "Paris", "Madrid"]
+    ]
+    participant_ids = [
+        crud.participant.create(
+            db,
+            obj_in=ParticipantCreate(
+                event_id=event_id, join_mode=JoinMode.online, lat=48.85, lon=2.35
+            ),
+        ).id
+        for event_id in [event_ids[0], event_ids[0], event_ids[1], event_ids[2]]
+    ]
+
+    async_engine = create_async_engine(url.replace("sqlite", "sqlite+aiosqlite"))
+    monkeypatch.setattr(
+        presence,
+        "AsyncSessionLocal",
+        sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    updates = []
+
+    def record_update(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        if statement.startswith("UPDATE participants"):
+            updates.append(statement)
+
+    sqlalchemy_event.listen(
+        async_engine.sync_engine, "before_cursor_execute", record_update
+    )
+
+    async def scenario() -> list[int]:
+        published: list[int] = []
+
+        async def publish(event_id: int) -> None:
+            published.append(event_id)
+
+        buffer = PresenceBuffer(publish)
+        first, second, third, _ = participant_ids
+
+        assert buffer.set_active(event_ids[0], first, True)
+        assert not buffer.set_active(event_ids[0], first, True)
+        assert buffer.set_active(event_ids[0], second, True)
+        assert buffer.set_active(event_ids[0], second, False)
+        assert buffer.set_active(event_ids[1], third, True)
+
+        # Joins are only published once written
+        assert buffer.pending == 3
+        assert published == []
+
+        await buffer.flush()
+
+        assert buffer.pending == 0
+        assert buffer.flushes == 1
+
+        # Nothing left to write, nor to publish
+        await buffer.flush()
+        assert buffer.flushes == 1
+
+        await async_engine.dispose()
+        return published
+
+    published = asyncio.run(scenario())
+
+    assert len(updates) == 2
+    assert sorted(published) == event_ids[:2]
+
+    # Participants join active, the last one was left as it is
+    db.expire_all()
+    assert [
+        db.get(models.Participant, participant_id).active
+        for participant_id in participant_ids
+    ] == [True, False, True, True]
+
+    db.close()
+    engine.dispose()